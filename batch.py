@@ -0,0 +1,143 @@
+"""
+Headless batch generation: runs the jobs of a JSONL file through the same pipeline as the Streamlit form.
+
+Each input line is a job with an "id" and the form fields: option ("Post de LinkedIn" or "Seção de Livro"), theme,
+title, objective, keywords, tone, target, persona, length, text_area, long_form and attachments (paths to PDF or
+image files). Results are appended to the output JSONL as they finish, and jobs already finished in the output are
+skipped, so an interrupted run can be resumed with the same command.
+
+Usage:
+    python batch.py jobs.jsonl --output results.jsonl --workers 4
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Set, TextIO
+
+import argparse
+import json
+import os
+import time
+
+from dotenv import load_dotenv
+
+from src.personas import personas as module_personas
+from src.pipeline import pipeline
+from src.prompts import prompts
+
+load_dotenv()
+
+def load_finished(output_path: str) -> Set[str]:
+    """
+    Returns the ids of the jobs successfully finished in a previous run.
+    """
+    finished = set()
+    if os.path.exists(output_path):
+        with open(output_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # line cut short by a crash
+                if result.get("status") == "ok":
+                    finished.add(str(result["id"]))
+    return finished
+
+def open_output(output_path: str) -> TextIO:
+    """
+    Opens the output for appending, first truncating a last line cut short by a crash, so that the next result starts
+    on a line of its own.
+    """
+    if os.path.exists(output_path):
+        with open(output_path, "rb+") as f:
+            data = f.read()
+            if data and not data.endswith(b"\n"):
+                f.truncate(data.rfind(b"\n") + 1)
+    return open(output_path, "a", encoding="utf-8")
+
+def to_request(job: dict) -> pipeline.ContentRequest:
+    """
+    Builds a ContentRequest from a job, reading its attachments from disk.
+
+    Raises:
+        ValueError: If a required field is missing or invalid, or the option or persona is unknown.
+    """
+    missing = [name for name in ("theme", "title", "objective") if not job.get(name)]
+    if missing:
+        raise ValueError(f"Missing required fields: {missing}")
+    option = job.get("option", pipeline.LINKEDIN_POST)
+    if option not in pipeline.PROMPT_ENV_VARS:
+        raise ValueError(f"Unknown option: {option} (expected one of {list(pipeline.PROMPT_ENV_VARS)})")
+    length = job.get("length")
+    if job.get("long_form") and (not isinstance(length, int) or length <= 0):
+        raise ValueError(f"Long-form jobs need a positive integer length, got {length!r}")
+    persona = job.get("persona", "")
+    if persona and persona not in module_personas.persona_names():
+        raise ValueError(f"Unknown persona: {persona}")
+
+    attachments = []
+    for path in job.get("attachments", []):
+        with open(path, "rb") as f:
+            attachments.append(pipeline.Attachment(os.path.basename(path), f.read()))
+
+    target = job.get("target", [])
+    return pipeline.ContentRequest(
+        option=option, theme=job["theme"], title=job["title"],
+        objective=job["objective"], keywords=job.get("keywords", ""), length=length,
+        tone=job.get("tone", ""), target=[target] if isinstance(target, str) else target, style=persona,
+        text_area=job.get("text_area", ""), attachments=attachments, long_form=job.get("long_form", False)
+    )
+
+def run_job(job: dict, registry: prompts.PromptRegistry, use_cache: bool) -> dict:
+    started = time.perf_counter()
+    try:
+        request = to_request(job)
+        content = "".join(pipeline.generate(request, pipeline.prepare(request, registry), use_cache=use_cache))
+        return {"id": job["id"], "status": "ok", "content": content, "elapsed": time.perf_counter() - started}
+    except Exception as e:
+        return {"id": job["id"], "status": "error", "error": f"{type(e).__name__}: {e}",
+                "elapsed": time.perf_counter() - started}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate content for every job of a JSONL file.")
+    parser.add_argument("input", help="JSONL file with one job per line.")
+    parser.add_argument("--output", default="batch_results.jsonl", help="JSONL file the results are appended to.")
+    parser.add_argument("--workers", type=int, default=4, help="Number of jobs generated at the same time.")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the response cache.")
+    args = parser.parse_args()
+
+    with open(args.input, "r", encoding="utf-8") as f:
+        jobs = [json.loads(line) for line in f if line.strip()]
+    for index, job in enumerate(jobs):
+        job.setdefault("id", str(index))
+
+    finished = load_finished(args.output)
+    pending = [job for job in jobs if str(job["id"]) not in finished]
+    print(f"{len(jobs)} job(s), {len(jobs) - len(pending)} already finished, {len(pending)} to run.")
+
+    registry = pipeline.create_prompt_registry()
+    failures = []
+    words = 0
+    started = time.perf_counter()
+
+    with open_output(args.output) as output, ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = [executor.submit(run_job, job, registry, not args.no_cache) for job in pending]
+        for future in as_completed(futures):
+            result = future.result()
+            output.write(json.dumps(result, ensure_ascii=False) + "\n")
+            output.flush()
+            os.fsync(output.fileno())
+            if result["status"] == "ok":
+                words += len(result["content"].split())
+                print(f"[ok] {result['id']} ({result['elapsed']:.1f}s)")
+            else:
+                failures.append(result)
+                print(f"[error] {result['id']}: {result['error']}")
+
+    elapsed = time.perf_counter() - started
+    succeeded = len(pending) - len(failures)
+    print(f"\nFinished {succeeded}/{len(pending)} job(s) in {elapsed:.1f}s "
+          f"({succeeded / elapsed * 60 if elapsed else 0:.1f} jobs/min, {words / elapsed if elapsed else 0:.0f} words/s).")
+    if failures:
+        print(f"{len(failures)} failure(s): {', '.join(str(result['id']) for result in failures)}")
+
+if __name__ == "__main__":
+    main()
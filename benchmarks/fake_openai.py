@@ -0,0 +1,157 @@
+"""
+A local stub of the OpenAI chat-completions API, for running the app and the benchmarks offline.
+
+Answers POST /v1/chat/completions, blocking or streamed (server-sent events, with the usage chunk when
+stream_options.include_usage is set), after a configurable latency. Long-form outline requests get a fixed outline.
+Errors can be queued with FakeOpenAI.fail, to exercise the retries of the client layer.
+
+Usage:
+    python -m benchmarks.fake_openai [--port 8765] [--latency 0.05] [--token-delay 0.002] [--tokens 50]
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=fake streamlit run main.py
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+import argparse
+import json
+import threading
+import time
+
+OUTLINE = {"subsecoes": [{"titulo": f"Subseção {index}", "objetivo": f"Objetivo da subseção {index}", "palavras": 800}
+                         for index in range(1, 4)]}
+
+class FakeOpenAI:
+    """
+    The stub server, running in a daemon thread while used as a context manager.
+
+    Attributes:
+        latency (float): Seconds before the first byte of each response.
+        token_delay (float): Seconds between streamed chunks.
+        tokens (int): Number of chunks (one word each) of each response.
+        requests (int): Number of requests answered so far.
+        last_request (dict): The body of the last request.
+        aborted (int): Number of streams the client closed before their end.
+        errors (list): (status, headers) of the errors answered to the next requests, see fail.
+    """
+
+    def __init__(self, port: int = 0, latency: float = 0.05, token_delay: float = 0.002, tokens: int = 50):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.tokens = tokens
+        self.requests = 0
+        self.last_request: Optional[dict] = None
+        self.aborted = 0
+        self.errors: List[Tuple[int, Dict[str, str]]] = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self.__handler())
+        self._server.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+
+    def __enter__(self) -> "FakeOpenAI":
+        threading.Thread(target=self._server.serve_forever, name="fake-openai", daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def fail(self, status: int, count: int = 1, headers: Optional[Dict[str, str]] = None) -> None:
+        """
+        Answers the next count requests with an error status, e.g. 429 with a Retry-After header, or 503.
+        """
+        with self._lock:
+            self.errors.extend([(status, headers or {})] * count)
+
+    def serve_forever(self) -> None:
+        self._server.serve_forever()
+
+    def __handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def do_POST(self) -> None:
+                if not self.path.endswith("/chat/completions"):
+                    self.send_error(404)
+                    return
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with server._lock:
+                    server.requests += 1
+                    server.last_request = body
+                    error = server.errors.pop(0) if server.errors else None
+                time.sleep(server.latency)
+                if error is not None:
+                    status, headers = error
+                    self.__send_json({"error": {"message": f"Fake error {status}", "type": "fake_error", "code": None}},
+                                     status, headers)
+                    return
+
+                prompt = json.dumps(body["messages"][-1]["content"], ensure_ascii=False)
+                if '\\"subsecoes\\"' in prompt:
+                    words = [json.dumps(OUTLINE, ensure_ascii=False)]
+                else:
+                    words = [f" palavra{index}" for index in range(server.tokens)]
+                usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(words), "total_tokens": len(prompt) // 4 + len(words)}
+
+                if body.get("stream"):
+                    self.__stream(body, words, usage)
+                else:
+                    self.__send_json({"id": "fake", "object": "chat.completion", "created": int(time.time()), "model": body["model"],
+                                      "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(words)}, "finish_reason": "stop"}],
+                                      "usage": usage})
+
+            def __send_json(self, data: dict, status: int = 200, headers: Optional[Dict[str, str]] = None) -> None:
+                payload = json.dumps(data).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for header, value in (headers or {}).items():
+                    self.send_header(header, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def __stream(self, body: dict, words: list, usage: dict) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                chunk = {"id": "fake", "object": "chat.completion.chunk", "created": int(time.time()), "model": body["model"]}
+                try:
+                    for index, word in enumerate(words):
+                        if index:
+                            time.sleep(server.token_delay)
+                        delta = {"choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}]}
+                        self.wfile.write(f"data: {json.dumps({**chunk, **delta})}\n\n".encode("utf-8"))
+                        self.wfile.flush()
+                    if (body.get("stream_options") or {}).get("include_usage"):
+                        self.wfile.write(f"data: {json.dumps({**chunk, 'choices': [], 'usage': usage})}\n\n".encode("utf-8"))
+                    self.wfile.write(b"data: [DONE]\n\n")
+                    self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    with server._lock:
+                        server.aborted += 1
+
+        return Handler
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve a local stub of the OpenAI chat-completions API.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds before the first byte of each response.")
+    parser.add_argument("--token-delay", type=float, default=0.002, help="Seconds between streamed chunks.")
+    parser.add_argument("--tokens", type=int, default=50, help="Number of chunks of each response.")
+    args = parser.parse_args()
+
+    server = FakeOpenAI(args.port, args.latency, args.token_delay, args.tokens)
+    print(f"Serving on {server.base_url}")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
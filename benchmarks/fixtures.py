@@ -0,0 +1,51 @@
+"""
+Synthetic attachments for the benchmarks: text PDFs and noisy images of any size, varied by seed so that
+in-memory caches keyed by content never hit.
+"""
+import io
+import random
+
+import numpy as np
+from PIL import Image
+
+WORDS = ("empreendedorismo", "liderança", "cultura", "mercado", "inovação", "equipe", "resultado", "cliente",
+         "estratégia", "crescimento", "gestão", "pessoas", "tecnologia", "propósito", "aprendizado", "risco")
+
+def synthetic_pdf(pages: int, seed: int = 0, lines_per_page: int = 40) -> bytes:
+    """
+    A PDF of the given number of pages, each with lines_per_page lines of pseudo-random Portuguese words.
+    """
+    rng = random.Random(seed)
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"]
+    kids = []
+    for _ in range(pages):
+        lines = [" ".join(rng.choice(WORDS) for _ in range(10)) for _ in range(lines_per_page)]
+        stream = b"BT /F1 10 Tf 40 800 Td 14 TL " + b" ".join(f"({line}) '".encode("latin-1") for line in lines) + b" ET"
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>"
+                       % len(objects))
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % kid for kid in kids), pages)
+
+    pdf = io.BytesIO()
+    pdf.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, content in enumerate(objects, start=1):
+        offsets.append(pdf.tell())
+        pdf.write(b"%d 0 obj\n%s\nendobj\n" % (number, content))
+    xref = pdf.tell()
+    pdf.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    pdf.write(b"".join(b"%010d 00000 n \n" % offset for offset in offsets))
+    pdf.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return pdf.getvalue()
+
+def synthetic_image(width: int, height: int, seed: int = 0, format: str = "PNG") -> bytes:
+    """
+    A smooth gradient with noise, i.e. a photo-like image that does not compress to nothing.
+    """
+    rng = np.random.default_rng(seed)
+    gradient = np.linspace(0, 255, width, dtype=np.float32)[None, :, None] * rng.uniform(0.3, 1, size=3)
+    pixels = np.clip(gradient + rng.normal(0, 8, size=(height, width, 3)), 0, 255).astype(np.uint8)
+    output = io.BytesIO()
+    Image.fromarray(pixels, "RGB").save(output, format=format)
+    return output.getvalue()
@@ -0,0 +1,134 @@
+"""
+Micro-benchmark of the transcription.py segment helpers on synthetic diarized segments.
+
+Times them against the original list-of-dicts implementation, kept below as reference. tests/test_transcription.py
+checks that both produce the same output, byte for byte.
+
+Usage:
+    python -m benchmarks.segments [--segments 50000] [--speakers 8] [--repeat 3]
+"""
+from typing import List
+
+import argparse
+import random
+import time
+
+from transcription import TranscriptionIntermediateRequest
+
+_speaker_segments = TranscriptionIntermediateRequest._TranscriptionIntermediateRequest__speaker_segments
+_transcript_by_segments = TranscriptionIntermediateRequest._TranscriptionIntermediateRequest__transcript_by_segments
+
+def reference_transcript_by_segments(segments) -> str:
+    transcript = ""
+    last_speaker = None
+    for segment in segments:
+        if last_speaker is None:
+            transcript += f"*{segment['speaker']}:* \"{segment['text'].strip()}"
+        elif last_speaker != segment['speaker']:
+            transcript += f"\"\n*{segment['speaker']}:* \"{segment['text'].strip()}"
+        else:
+            transcript += f" {segment['text'].strip()}"
+        last_speaker = segment['speaker']
+    transcript += "\"\n"
+    return transcript
+
+def reference_speaker_segments(segments) -> dict:
+    unique_speakers = set([segment['speaker'] for segment in segments])
+    pairs = {}
+    for segment in segments:
+        start = segment['start']
+        end = segment['end']
+        if segment['speaker'] not in pairs:
+            if end - start < 5:
+                continue
+            elif end - start < 10:
+                interval = (start, end)
+            elif end - start > 15:
+                interval = (start, start + 15)
+            else:
+                interval = (start, start + 10)
+            pairs[segment['speaker']] = interval
+    if len(pairs) != len(unique_speakers):
+        combined_segments = {}
+        for segment in segments:
+            if segment['speaker'] not in combined_segments:
+                combined_segments[segment['speaker']] = []
+            combined_segments[segment['speaker']].append((segment['start'], segment['end']))
+        for speaker in combined_segments:
+            if speaker not in pairs:
+                total_duration = sum([end - start for start, end in combined_segments[speaker]])
+                if total_duration < 5:
+                    pairs[speaker] = None
+                else:
+                    intervals = []
+                    for start, end in combined_segments[speaker]:
+                        if sum([e - s for s, e in intervals]) >= 10:
+                            break
+                        else:
+                            intervals.append((start, end))
+                    pairs[speaker] = intervals
+    return pairs
+
+def reference_map_segments(pairs: dict) -> dict:
+    mapped_segments = {}
+    for pair in pairs:
+        if pair not in mapped_segments:
+            mapped_intervals = None
+            if pairs[pair] is not None and type(pairs[pair]) == list:
+                mapped_intervals = [(start * 1000, end * 1000) for start, end in pairs[pair]]
+            elif pairs[pair] is not None:
+                mapped_intervals = [(pairs[pair][0] * 1000, pairs[pair][1] * 1000)]
+            mapped_segments[pair] = mapped_intervals
+    return mapped_segments
+
+def synthetic_segments(count: int, speakers: int, seed: int = 0) -> List[dict]:
+    """
+    Builds diarized segments alternating randomly between speakers, exercising every branch of the helpers:
+    the first speakers have segments of all lengths, the next to last only very short ones (so their intervals are
+    combined from many segments) and the last one too little audio to be identified.
+    """
+    rng = random.Random(seed)
+    segments = []
+    position = 0.0
+    for index in range(count):
+        if index >= count - 3:
+            speaker, duration = speakers - 1, 0.2
+        else:
+            speaker = rng.randrange(speakers - 1)
+            if speaker == speakers - 2:
+                duration = rng.uniform(0.001, 0.003)
+            else:
+                duration = rng.choice([rng.uniform(0.5, 4.9), rng.uniform(5, 9.9), rng.uniform(10, 15), rng.uniform(15.1, 30)])
+        segments.append({"start": position, "end": position + duration,
+                         "speaker": f"SPEAKER_{speaker:02d}", "text": f" segmento {index} "})
+        position += duration + rng.uniform(0, 1)
+    return segments
+
+def best_time(function, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the transcription segment helpers.")
+    parser.add_argument("--segments", type=int, default=50000)
+    parser.add_argument("--speakers", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    segments = synthetic_segments(args.segments, args.speakers)
+    for name, current, reference in (
+        ("speaker_segments", lambda: _speaker_segments(segments), lambda: reference_speaker_segments(segments)),
+        ("transcript_by_segments", lambda: _transcript_by_segments(segments), lambda: reference_transcript_by_segments(segments)),
+        ("from_segments", lambda: TranscriptionIntermediateRequest.from_segments(segments),
+         lambda: (reference_transcript_by_segments(segments), reference_map_segments(reference_speaker_segments(segments)))),
+    ):
+        current_time, reference_time = best_time(current, args.repeat), best_time(reference, args.repeat)
+        print(f"{name}: {current_time * 1000:.1f} ms (reference {reference_time * 1000:.1f} ms, {reference_time / current_time:.1f}x) "
+              f"for {len(segments)} segments")
+
+if __name__ == "__main__":
+    main()
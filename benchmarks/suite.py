@@ -0,0 +1,208 @@
+"""
+Offline end-to-end benchmarks of the app: the startup and rerun time of main.py, its submit pipeline (pipeline.prepare +
+pipeline.generate) against a local stub of the OpenAI API, with synthetic PDFs and images, the persona and prompt
+loading, and the transcription.py segment helpers.
+
+Reports the p50/p95 latency and the throughput of each scenario, and compares the p50 with a saved baseline: the run
+fails (exit code 1) if any scenario got slower than the baseline by more than the threshold.
+
+Usage:
+    python -m benchmarks.suite --save-baseline    # on the reference commit
+    python -m benchmarks.suite                    # after a change
+    python -m benchmarks.suite --only submit_stream pdf_large --iterations 50 --threshold 0.1
+"""
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The benchmarks must never be throttled, retried or served from the cache
+os.environ.setdefault("OPENAI_API_KEY", "fake")
+os.environ.setdefault("OPENAI_RATE_LIMIT", "1000000")
+os.environ.setdefault("OPENAI_RATE_LIMIT_BURST", "1000000")
+os.environ.setdefault("OPENAI_MAX_RETRIES", "0")
+os.environ.setdefault("LINKEDIN_SYSTEM_PROMPT_PATH", os.path.join(BASE_DIR, "LinkedIn", "Monica", "Prompts", "system_prompt.txt"))
+os.environ.setdefault("LINKEDIN_USER_PROMPT_TEMPLATE_PATH", os.path.join(BASE_DIR, "LinkedIn", "Monica", "Prompts", "user_prompt_template.txt"))
+os.environ.setdefault("BOOK_SYSTEM_PROMPT_PATH", os.path.join(BASE_DIR, "Book", "Generic", "system_prompt.txt"))
+os.environ.setdefault("BOOK_USER_PROMPT_TEMPLATE_PATH", os.path.join(BASE_DIR, "Book", "Generic", "user_prompt_template.txt"))
+
+from benchmarks.fake_openai import FakeOpenAI
+from benchmarks.fixtures import synthetic_image, synthetic_pdf
+from benchmarks.segments import synthetic_segments
+from src.personas import personas as module_personas
+from src.pipeline import pipeline
+from transcription import TranscriptionIntermediateRequest
+
+BASELINE_PATH = ".cache/benchmarks/baseline.json"
+PERSONA = "Mônica Hauck"
+
+# A fresh process rendering the form once, like a new container serving its first page
+COLD_START = """
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file({path!r}, default_timeout=60).run()
+assert not app.exception, app.exception
+"""
+
+@dataclass
+class Scenario:
+    """
+    A benchmarked operation.
+
+    Attributes:
+        setup (callable): Builds the input of an iteration from its index, outside of the timed section.
+        run (callable): The timed operation, returning the number of units it processed.
+        unit (str): What run counts, for the throughput.
+    """
+    name: str
+    setup: Callable[[int], Any]
+    run: Callable[[Any], int]
+    unit: str
+
+def content_request(index: int, **fields) -> pipeline.ContentRequest:
+    return pipeline.ContentRequest(option=fields.pop("option", pipeline.LINKEDIN_POST), theme=f"Liderança em startups {index}",
+                                   title="Por que a cultura vem antes da estratégia?", objective="Provocar reflexão sobre cultura e liderança",
+                                   keywords="cultura, liderança, equipe", tone="Inspirador", style=PERSONA, **fields)
+
+def submit(request: pipeline.ContentRequest, registry) -> int:
+    """
+    What main.py does on submit, without Streamlit: returns the number of chunks streamed.
+    """
+    prepared = pipeline.prepare(request, registry)
+    return sum(1 for _ in pipeline.generate(request, prepared, use_cache=False))
+
+def scenarios(registry) -> List[Scenario]:
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(os.path.join(BASE_DIR, "main.py"), default_timeout=60)
+
+    def cold_start(_) -> int:
+        subprocess.run([sys.executable, "-c", COLD_START.format(path=os.path.join(BASE_DIR, "main.py"))], check=True, cwd=BASE_DIR,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return 1
+
+    def rerun(_) -> int:
+        app.run()
+        return 1
+
+    def load_personas(_) -> int:
+        store = module_personas.PersonaStore(os.path.join(BASE_DIR, "LinkedIn"))
+        pipeline.create_prompt_registry()
+        return len([store.get(name).block for name in store.names()])
+
+    def transcript(segments: List[dict]) -> int:
+        TranscriptionIntermediateRequest.from_segments(segments)
+        return len(segments)
+
+    def attachments(index: int, pdf_pages: int = 0, images: int = 0) -> pipeline.ContentRequest:
+        files = [pipeline.Attachment(f"documento{index}.pdf", synthetic_pdf(pdf_pages, seed=index))] if pdf_pages else []
+        files += [pipeline.Attachment(f"imagem{image}.png", synthetic_image(2400, 1600, seed=index * 10 + image)) for image in range(images)]
+        return content_request(index, attachments=files + files[-1:])  # plus a duplicate of the last file
+
+    return [
+        Scenario("app_cold_start", lambda index: None, cold_start, "starts"),
+        Scenario("app_rerun", lambda index: None, rerun, "reruns"),
+        Scenario("persona_loading", lambda index: None, load_personas, "personas"),
+        Scenario("prompt_building", content_request, lambda request: len(pipeline.prepare(request, registry).messages), "requests"),
+        Scenario("pdf_small", lambda index: attachments(index, pdf_pages=8), lambda request: pipeline.prepare(request, registry).documents[0].page_count, "pages"),
+        Scenario("pdf_large", lambda index: attachments(index, pdf_pages=96), lambda request: pipeline.prepare(request, registry).documents[0].page_count, "pages"),
+        Scenario("images", lambda index: attachments(index, images=2), lambda request: len(pipeline.prepare(request, registry).images), "images"),
+        Scenario("submit_stream", content_request, lambda request: submit(request, registry), "chunks"),
+        Scenario("submit_with_attachments", lambda index: attachments(index, pdf_pages=8, images=1), lambda request: submit(request, registry), "chunks"),
+        Scenario("submit_long_form", lambda index: content_request(index, option=pipeline.BOOK_SECTION, length=2400, long_form=True),
+                 lambda request: submit(request, registry), "subsections"),
+        Scenario("transcript_segments", lambda index: synthetic_segments(20000, 8, seed=index),
+                 transcript, "segments"),
+    ]
+
+def measure(scenario: Scenario, iterations: int, warmup: int) -> Dict[str, float]:
+    times, units = [], 0
+    for index in range(warmup + iterations):
+        data = scenario.setup(index)
+        started = time.perf_counter()
+        processed = scenario.run(data)
+        elapsed = time.perf_counter() - started
+        if index >= warmup:
+            times.append(elapsed)
+            units += processed
+    return {"p50": float(np.percentile(times, 50)), "p95": float(np.percentile(times, 95)),
+            "throughput": units / sum(times), "unit": scenario.unit, "iterations": iterations}
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float, min_delta: float) -> List[str]:
+    """
+    Returns the scenarios whose p50 exceeds the baseline's by more than threshold (a fraction) and by more than
+    min_delta seconds, so that the timer noise of sub-millisecond scenarios is not reported.
+    """
+    regressions = []
+    for name, result in results.items():
+        if name in baseline and result["p50"] > max(baseline[name]["p50"] * (1 + threshold), baseline[name]["p50"] + min_delta):
+            regressions.append(name)
+    return regressions
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the offline benchmarks and compare them with a baseline.")
+    parser.add_argument("--only", nargs="+", help="Names of the scenarios to run.")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds before the first byte of each stub response.")
+    parser.add_argument("--token-delay", type=float, default=0.002, help="Seconds between streamed chunks of the stub.")
+    parser.add_argument("--tokens", type=int, default=50, help="Number of chunks of each stub response.")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Save the results as the new baseline.")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed p50 slowdown over the baseline, as a fraction.")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="Ignore p50 slowdowns smaller than this.")
+    parser.add_argument("--output", help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    settings = {"latency": args.latency, "token_delay": args.token_delay, "tokens": args.tokens}
+    baseline: Optional[Dict[str, dict]] = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        baseline = saved["results"]
+        if saved["settings"] != settings:
+            print(f"Warning: the baseline was measured with different stub settings ({saved['settings']}).")
+
+    results = {}
+    with FakeOpenAI(latency=args.latency, token_delay=args.token_delay, tokens=args.tokens) as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        registry = pipeline.create_prompt_registry()
+        for scenario in scenarios(registry):
+            if args.only and scenario.name not in args.only:
+                continue
+            results[scenario.name] = result = measure(scenario, args.iterations, args.warmup)
+            change = ""
+            if baseline and scenario.name in baseline:
+                change = f"  ({result['p50'] / baseline[scenario.name]['p50'] - 1:+.0%} vs baseline)"
+            print(f"{scenario.name:<24} p50 {result['p50'] * 1000:9.1f} ms   p95 {result['p95'] * 1000:9.1f} ms   "
+                  f"{result['throughput']:10.1f} {result['unit']}/s{change}")
+
+    report = {"created": time.time(), "settings": settings, "results": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        if os.path.dirname(args.baseline):
+            os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}.")
+    elif baseline is None:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one.")
+    else:
+        regressions = compare(results, baseline, args.threshold, args.min_delta_ms / 1000)
+        if regressions:
+            print(f"Regressions over {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print(f"No regression over {args.threshold:.0%}.")
+
+if __name__ == "__main__":
+    main()
@@ -1,38 +1,65 @@
 import streamlit as st
 from dotenv import load_dotenv
-import openai
-import base64
-from uuid import uuid4
+import logging
 import os
+import threading
+import time
 
-from src.utils import utils
+from src.metrics import metrics
 from src.personas import personas as module_personas
-
-from langchain_community.document_loaders import PyPDFium2Loader
-
-load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
+from src.prompts import prompts
+from src.pipeline import pipeline
+
+started = time.perf_counter()
+
+@st.cache_resource
+def load_config() -> float:
+    """
+    Loads the .env file once per process, and returns when, to tell the first run of the process from reruns.
+    """
+    load_dotenv()
+    return time.perf_counter()
+
+first_run = load_config() >= started
+
+# Maximum time to render the form on the first run of a process and on reruns (every widget interaction)
+STARTUP_BUDGET = float(os.getenv("STARTUP_BUDGET_SECONDS", 1.0))
+RERUN_BUDGET = float(os.getenv("RERUN_BUDGET_SECONDS", 0.1))
+
+@st.cache_resource
+def get_prompt_registry() -> prompts.PromptRegistry:
+    return pipeline.create_prompt_registry()
+
+@st.cache_resource
+def preload_pipeline() -> threading.Thread:
+    """
+    Imports the PDF, image and LLM modules in the background, once per process, so that neither the first render of
+    the form nor the first submit has to wait for them.
+    """
+    thread = threading.Thread(target=pipeline.preload, name="preload-pipeline", daemon=True)
+    thread.start()
+    return thread
 
 st.title("Escreva conteúdo autêntico com pouco.")
 
 tones = ["Neutro", "Explicativo", "Instrutivo", "Analítico", "Inspirador", "Empático", "Conversacional", "Crítico", "Provocativo", "Persuasivo", "Técnico"]
-personas = ["Mônica Hauck", "Alessandro Vieira", "Persona Neutra"]
+personas = module_personas.persona_names()
 targets = ["Empreendedores iniciantes", "Empreendedores experientes", "Profissionais de RH", "Investidores", "Estudantes", "Outros"]
 
 option = st.radio(
     "O que você gostaria de gerar?",
-    ("Post de LinkedIn", "Seção de Livro"),
+    (pipeline.LINKEDIN_POST, pipeline.BOOK_SECTION),
     index=0
 )
 
 # Seção obrigatória
 
 with st.expander("Informações Essenciais (Obrigatório)"):
-    if option == "Seção de Livro":
+    if option == pipeline.BOOK_SECTION:
         theme = st.text_input("Sobre o que é o livro?", placeholder="Exemplo: Empreendedorismo no Brasil")
         title = st.text_input("Qual deve ser o título da seção?", placeholder="Exemplo: Dificuldades históricas e atuais do empreendedorismo no Brasil")
         objective = st.text_area("O que precisa ser passado na seção?", placeholder="Exemplo: Contextualizar os principais obstáculos enfrentados por empreendedores no Brasil ao longo do tempo, destacando fatores históricos, culturais, burocráticos e econômicos.", height=100)
-    elif option == "Post de LinkedIn":
+    elif option == pipeline.LINKEDIN_POST:
         theme = st.text_input("Sobre o que é o post?", placeholder="Exemplo: empreendedorismo no Brasil")
         title = st.text_input("Qual deve ser o título do post?", placeholder="Exemplo: Por que empreender no Brasil é um ato de coragem?")
         objective = st.text_area("O que precisa ser passado no post?", placeholder="Exemplo: Provocar reflexão sobre os desafios enfrentados por empreendedores no Brasil, destacando fatores culturais, burocráticos e estruturais.", height=100)
@@ -54,12 +81,14 @@ with st.expander("Detalhes do Conteúdo (Opcional)"):
     tone = st.radio(
         "Qual tom deve ser abordado na escrita?",
         options=tones,
-        index=6 if option == "Post de LinkedIn" else 1  # "conversacional" para LinkedIn, "explicativo" para Livro
+        index=6 if option == pipeline.LINKEDIN_POST else 1  # "conversacional" para LinkedIn, "explicativo" para Livro
     )
-    if option == "Seção de Livro":
+    if option == pipeline.BOOK_SECTION:
         length = st.slider("Quantas palavras aproximadamente o conteúdo deve possuir?", 500, 10000, step=250, value=2000)
-    elif option == "Post de LinkedIn":
+        long_form = st.checkbox("Gerar em partes (esboço + subseções em paralelo)", value=length >= 3000, help="Recomendado para seções longas: é mais rápido e respeita melhor o tamanho pedido.")
+    elif option == pipeline.LINKEDIN_POST:
         length = st.slider("Quantas palavras aproximadamente o conteúdo deve possuir?", 25, 500, step=25, value=100)
+        long_form = False
 
 # Seção opcional extra
 
@@ -73,53 +102,63 @@ with st.expander("Informações Adicionais (Opcional)"):
         accept_multiple_files=True
     )
 
+bypass_cache = st.checkbox("Ignorar cache de respostas", value=False, help="Gera um novo conteúdo mesmo que as mesmas informações já tenham sido enviadas.")
 submit_button = st.button("Gerar conteúdo")
 
-if submit_button and title and objective and theme:
-    # Processar documentos
-    doc_content = ""
-    images = []
-    for appended_document in appended_documents:
-        if appended_document:
-            if appended_document.name.split(".")[-1] == "pdf":
-                copy = f"{uuid4()}.pdf"
-                with open(copy, "wb") as f:
-                    f.write(appended_document.read())
-                doc_content += "\n".join([page.page_content for page in PyPDFium2Loader(copy).lazy_load()])
-                os.remove(copy)
-            else:
-                images.append({
-                    "type": "image_url",
-                    "image_url": {
-                        "url": f"data:image/jpeg;base64,{base64.b64encode(appended_document.read()).decode('utf-8')}",
-                    },
-                })
-
-    system_prompt = open(os.getenv("BOOK_SYSTEM_PROMPT_PATH", ""), "r").read() if option == "Seção de Livro" else open(os.getenv("LINKEDIN_SYSTEM_PROMPT_PATH", ""), "r").read()
-    user_prompt = open(os.getenv("BOOK_USER_PROMPT_TEMPLATE_PATH", ""), "r").read() if option == "Seção de Livro" else open(os.getenv("LINKEDIN_USER_PROMPT_TEMPLATE_PATH", ""), "r").read()
-
-    user_prompt = user_prompt.format(
-        theme=theme if theme else "Não especificado",
-        title=title if title else "Não especificado",
-        objective=objective if objective else "Não especificado",
-        keywords=keywords if keywords else "Não especificado",
-        length=length if length else "Não especificado",
-        tone=tone if tone else "Não especificado",
-        target=target if target else "Não especificado",
-        style=module_personas.persona_instances[style] if style else "Não especificado",
-        text_area=text_area if text_area else "Não especificado",
-        doc_content=doc_content if doc_content else "Não especificado"
-    )
-
-    messages = [{
-        "role": "system",
-        "content": [{"type": "text", "text": system_prompt}]
-    }, {
-        "role": "user",
-        "content": [{"type": "text", "text": user_prompt}] + images
-    }]
-
-    result = utils.get_text_response("OPENAI_API_KEY", messages)
+form_seconds = time.perf_counter() - started
+run = "startup" if first_run else "rerun"
+metrics.observe("form_render", form_seconds, run=run)
+if form_seconds > (STARTUP_BUDGET if first_run else RERUN_BUDGET):
+    logging.getLogger(__name__).warning("Form rendered in %.3fs on %s, over budget.", form_seconds, run)
+preload_pipeline()
 
+if submit_button and title and objective and theme:
+    with metrics.collect() as events:
+        request = pipeline.ContentRequest(
+            option=option, theme=theme, title=title, objective=objective, keywords=keywords, length=length, tone=tone,
+            target=target, style=style, text_area=text_area, long_form=long_form,
+            attachments=[pipeline.Attachment(document.name, document.getvalue()) for document in appended_documents if document]
+        )
+        try:
+            prepared = pipeline.prepare(request, get_prompt_registry())
+        except (pipeline.AttachmentError, prompts.PromptTemplateError) as e:
+            st.error(str(e))
+            st.stop()
+
+        for document in prepared.documents:
+            st.caption(f"{document.name}: {document.page_count} página(s) em {document.elapsed:.2f}s" + (" (em cache)" if document.cached else ""))
+        if prepared.images:
+            original_size = sum(image.original_size for image in prepared.images)
+            st.caption(f"Imagens: {original_size / 1024:.0f} KB → {(original_size - prepared.image_bytes_saved) / 1024:.0f} KB "
+                       f"({prepared.image_bytes_saved / 1024:.0f} KB economizados" + (f", {prepared.duplicate_images} duplicada(s) removida(s)" if prepared.duplicate_images else "") + ").")
+        if prepared.selected_doc_tokens < prepared.doc_tokens:
+            st.caption(f"Conteúdo de apoio reduzido aos trechos mais relevantes: ~{prepared.selected_doc_tokens} de ~{prepared.doc_tokens} tokens.")
+
+        # O resultado fica na sessão para que um cancelamento (que reexecuta o script) preserve o conteúdo parcial
+        st.session_state["result"] = {"text": "", "complete": False}
+
+        st.subheader("Conteúdo gerado:")
+        st.button("Cancelar geração")  # qualquer clique reexecuta o script e interrompe o stream
+        placeholder = st.empty()
+        render_seconds = 0.0
+        for delta in pipeline.generate(request, prepared, use_cache=not bypass_cache):
+            st.session_state["result"]["text"] += delta
+            render_started = time.perf_counter()
+            placeholder.markdown(st.session_state["result"]["text"])
+            render_seconds += time.perf_counter() - render_started
+        st.session_state["result"]["complete"] = True
+        metrics.observe("render", render_seconds)
+
+        from src.utils import utils
+        response_cache = utils.get_response_cache()
+        st.caption(f"Cache de respostas: {response_cache.hits} acerto(s), {response_cache.misses} falha(s) neste processo.")
+
+    with st.expander("Diagnóstico"):
+        if metrics.enabled():
+            st.dataframe([{key: value for key, value in event.items() if key != "time"} for event in events])
+        else:
+            st.caption("Métricas desativadas. Defina METRICS_ENABLED=1 para registrar tempos por etapa e uso de tokens.")
+elif st.session_state.get("result") and not st.session_state["result"]["complete"]:
     st.subheader("Conteúdo gerado:")
-    st.write(result)
+    st.warning("Geração cancelada. Conteúdo parcial abaixo:")
+    st.code(st.session_state["result"]["text"], language=None, wrap_lines=True)
@@ -0,0 +1,124 @@
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+
+import pypdfium2
+
+# Documents with at least this many pages are split across the process pool (PDF_PARALLEL_MIN_PAGES)
+PARALLEL_MIN_PAGES = 32
+# Number of extracted documents kept in memory (PDF_CACHE_MAX_ENTRIES)
+CACHE_MAX_ENTRIES = 64
+
+class DocumentError(ValueError):
+    """
+    Raised when an attachment is not a valid PDF.
+    """
+
+@dataclass(frozen=True)
+class ExtractedDocument:
+    """
+    The text extracted from a PDF attachment.
+
+    Attributes:
+        name (str): The name of the uploaded file.
+        digest (str): The SHA-256 digest of the file content.
+        text (str): The text of all pages, joined by new lines.
+        page_count (int): The number of pages of the document.
+        elapsed (float): The time spent on this extraction, in seconds.
+        cached (bool): Whether the text came from the in-memory cache.
+    """
+    name: str
+    digest: str
+    text: str
+    page_count: int
+    elapsed: float
+    cached: bool
+
+_cache: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn instead of fork: the Streamlit server process is multithreaded
+            _executor = ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+def _extract_pages(data: bytes, start: int, stop: int) -> List[str]:
+    """
+    Extracts the text of pages [start, stop) of the PDF in data.
+    """
+    pdf = pypdfium2.PdfDocument(data)
+    try:
+        pages = []
+        for index in range(start, stop):
+            page = pdf[index]
+            textpage = page.get_textpage()
+            pages.append(textpage.get_text_range())
+            textpage.close()
+            page.close()
+        return pages
+    finally:
+        pdf.close()
+
+def extract_pdf(name: str, data: bytes) -> ExtractedDocument:
+    """
+    Extracts the text of a PDF straight from its bytes, without writing it to disk.
+
+    Documents of at least PDF_PARALLEL_MIN_PAGES pages are extracted in parallel across a process pool.
+    The text is memoized by content hash, so the same file is only parsed once per process.
+
+    Args:
+        name (str): The name of the uploaded file, used for reporting.
+        data (bytes): The content of the PDF file.
+
+    Returns:
+        ExtractedDocument: The extracted text and extraction statistics.
+
+    Raises:
+        DocumentError: If the file is not a valid PDF.
+    """
+    started = time.perf_counter()
+    digest = hashlib.sha256(data).hexdigest()
+
+    with _cache_lock:
+        if digest in _cache:
+            _cache.move_to_end(digest)
+            text, page_count = _cache[digest]
+            return ExtractedDocument(name, digest, text, page_count, time.perf_counter() - started, True)
+
+    try:
+        pdf = pypdfium2.PdfDocument(data)
+    except pypdfium2.PdfiumError as e:
+        raise DocumentError(f"'{name}': {e}") from e
+    page_count = len(pdf)
+    pdf.close()
+
+    workers = os.cpu_count() or 1
+    if page_count >= int(os.getenv("PDF_PARALLEL_MIN_PAGES", PARALLEL_MIN_PAGES)) and workers > 1:
+        step = -(-page_count // workers)
+        futures = [_get_executor().submit(_extract_pages, data, start, min(start + step, page_count))
+                   for start in range(0, page_count, step)]
+        pages = [page for future in futures for page in future.result()]
+    else:
+        pages = _extract_pages(data, 0, page_count)
+    text = "\n".join(pages)
+
+    max_entries = int(os.getenv("PDF_CACHE_MAX_ENTRIES", CACHE_MAX_ENTRIES))
+    with _cache_lock:
+        _cache[digest] = (text, page_count)
+        while len(_cache) > max_entries:
+            _cache.popitem(last=False)
+
+    return ExtractedDocument(name, digest, text, page_count, time.perf_counter() - started, False)
@@ -0,0 +1,132 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import base64
+import hashlib
+import io
+import os
+import threading
+
+from PIL import Image, ImageOps
+
+# Images are downscaled so that their longest edge is at most IMAGE_MAX_EDGE pixels, and re-encoded with
+# IMAGE_JPEG_QUALITY, unless set
+MAX_EDGE = 1568
+JPEG_QUALITY = 85
+# Number of encoded images kept in memory (IMAGE_CACHE_MAX_ENTRIES)
+CACHE_MAX_ENTRIES = 64
+
+class ImageDecodeError(ValueError):
+    """
+    Raised when an attachment is not an image Pillow can decode, is truncated, or is too large to decode safely.
+    """
+
+@dataclass(frozen=True)
+class EncodedImage:
+    """
+    An image attachment ready to be sent to the model.
+
+    Attributes:
+        name (str): The name of the uploaded file.
+        digest (str): The SHA-256 digest of the original file content.
+        mime (str): The MIME type of the encoded image.
+        data_url (str): The encoded image, as a base64 data URL.
+        original_size (int): The size of the original file, in bytes.
+        encoded_size (int): The size of the encoded image, in bytes.
+        cached (bool): Whether the encoding came from the in-memory cache.
+    """
+    name: str
+    digest: str
+    mime: str
+    data_url: str
+    original_size: int
+    encoded_size: int
+    cached: bool
+
+_cache: "OrderedDict[Tuple[str, int, int], Tuple[str, str, int]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+def _encode(data: bytes, max_edge: int, quality: int) -> Tuple[str, bytes]:
+    """
+    Downscales and re-encodes an image: JPEG for opaque images, PNG for images with transparency.
+    Keeps the original bytes when the image is already small and compact.
+
+    Raises:
+        PIL.UnidentifiedImageError: If data is not a supported image.
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        original_mime = Image.MIME.get(image.format, "application/octet-stream")
+        image = ImageOps.exif_transpose(image)
+        resized = max(image.size) > max_edge
+        if resized:
+            image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+
+        output = io.BytesIO()
+        if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+            image.save(output, format="PNG", optimize=True)
+            mime = "image/png"
+        else:
+            image.convert("RGB").save(output, format="JPEG", quality=quality, optimize=True, progressive=True)
+            mime = "image/jpeg"
+
+    if not resized and len(output.getvalue()) >= len(data) and original_mime in ("image/jpeg", "image/png", "image/webp", "image/gif"):
+        return original_mime, data
+    return mime, output.getvalue()
+
+def encode_image(name: str, data: bytes, max_edge: Optional[int] = None, quality: Optional[int] = None) -> EncodedImage:
+    """
+    Detects the real type of an image, downscales it to max_edge and re-encodes it compactly as a base64 data URL.
+    The result is memoized by content hash and settings.
+    max_edge and quality default to the IMAGE_MAX_EDGE and IMAGE_JPEG_QUALITY environment variables.
+
+    Raises:
+        ImageDecodeError: If data is not a supported image.
+    """
+    if max_edge is None:
+        max_edge = int(os.getenv("IMAGE_MAX_EDGE", MAX_EDGE))
+    if quality is None:
+        quality = int(os.getenv("IMAGE_JPEG_QUALITY", JPEG_QUALITY))
+    digest = hashlib.sha256(data).hexdigest()
+    key = (digest, max_edge, quality)
+
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            mime, data_url, encoded_size = _cache[key]
+            return EncodedImage(name, digest, mime, data_url, len(data), encoded_size, True)
+
+    try:
+        mime, encoded = _encode(data, max_edge, quality)
+    except (OSError, Image.DecompressionBombError) as e:  # UnidentifiedImageError and truncated files are OSErrors
+        raise ImageDecodeError(f"'{name}': {e}") from e
+    data_url = f"data:{mime};base64,{base64.b64encode(encoded).decode('utf-8')}"
+
+    max_entries = int(os.getenv("IMAGE_CACHE_MAX_ENTRIES", CACHE_MAX_ENTRIES))
+    with _cache_lock:
+        _cache[key] = (mime, data_url, len(encoded))
+        while len(_cache) > max_entries:
+            _cache.popitem(last=False)
+
+    return EncodedImage(name, digest, mime, data_url, len(data), len(encoded), False)
+
+def encode_images(attachments: List[Tuple[str, bytes]]) -> List[EncodedImage]:
+    """
+    Encodes (name, data) image attachments, dropping the ones with the same content as a previous one.
+
+    Raises:
+        ImageDecodeError: Listing every attachment that could not be decoded.
+    """
+    encoded, seen, errors = [], set(), []
+    for name, data in attachments:
+        try:
+            image = encode_image(name, data)
+        except ImageDecodeError as e:
+            errors.append(str(e))
+            continue
+        if image.digest not in seen:
+            seen.add(image.digest)
+            encoded.append(image)
+    if errors:
+        raise ImageDecodeError("; ".join(errors))
+    return encoded
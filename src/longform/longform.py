@@ -0,0 +1,124 @@
+from typing import Any, Iterator, List, Tuple
+
+import asyncio
+import json
+import os
+import time
+
+from src.metrics import metrics
+from src.utils import clients, utils
+
+# Maximum number of subsections generated at the same time, unless set by LONGFORM_MAX_CONCURRENCY
+MAX_CONCURRENCY = 4
+# Approximate number of words per subsection
+WORDS_PER_SUBSECTION = 800
+
+OUTLINE_PROMPT = """
+Antes de escrever, planeje o conteúdo pedido dividindo-o em {count} subseções sequenciais, somando cerca de {length} palavras.
+Responda somente com um JSON no formato {{"subsecoes": [{{"titulo": "...", "objetivo": "...", "palavras": 0}}]}}, sem nenhum outro texto.
+""".strip()
+
+SUBSECTION_PROMPT = """
+Seguindo o planejamento acima, escreva agora somente a subseção {position} de {count}: "{title}".
+Objetivo da subseção: {objective}
+Tamanho esperado: cerca de {words} palavras.
+Não escreva o título da subseção e não antecipe o conteúdo das próximas subseções; o texto será unido às demais subseções, em ordem.
+""".strip()
+
+def _parse_outline(text: str) -> List[dict]:
+    """
+    Parses the outline JSON, tolerating markdown code fences around it.
+
+    Raises:
+        ValueError: If the response is not a valid outline.
+    """
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end == -1:
+        raise ValueError(f"Invalid outline: {text}")
+    outline = json.loads(text[start:end + 1])
+    subsections = outline.get("subsecoes") if isinstance(outline, dict) else None
+    if not subsections or not isinstance(subsections, list) or not all(isinstance(subsection, dict) for subsection in subsections):
+        raise ValueError(f"Invalid outline: {text}")
+    return subsections
+
+def generate_outline(env_path: str, messages: List[dict], length: int,
+                     model: str = "gpt-4o-mini", temperature: float = 0.5, use_cache: bool = True) -> List[dict]:
+    """
+    Asks the model for an outline of the requested content.
+
+    Args:
+        env_path (str): The environment variable holding the OpenAI API key.
+        messages (list): The system and user messages of the request.
+        length (int): The total number of words requested.
+        use_cache (bool): Whether the outline may be answered from the response cache.
+
+    Returns:
+        list: The subsections, as dictionaries with "titulo", "objetivo" and "palavras" keys.
+
+    Raises:
+        ValueError: If the response is not a valid outline.
+    """
+    count = min(max(round(length / WORDS_PER_SUBSECTION), 2), 12)
+    outline_messages = messages + [{
+        "role": "user",
+        "content": [{"type": "text", "text": OUTLINE_PROMPT.format(count=count, length=length)}]
+    }]
+    with metrics.span("longform_outline"):
+        response = utils.get_text_response(env_path, outline_messages, model=model, temperature=temperature,
+                                        use_cache=use_cache)
+    return _parse_outline(response)
+
+async def _generate_subsection(env_path: str, semaphore: asyncio.Semaphore, messages: List[dict],
+                               model: str, temperature: float) -> Tuple[Any, float]:
+    """
+    Returns the completion of a subsection and the time it took, not counting the wait for a free slot.
+    """
+    async with semaphore:
+        started = time.perf_counter()
+        result = await clients.acreate_chat_completion(env_path, model=model, messages=messages, temperature=temperature)
+        return result, time.perf_counter() - started
+
+def generate_long_form_stream(env_path: str, messages: List[dict], length: int,
+                              model: str = "gpt-4o-mini", temperature: float = 0.5,
+                              use_cache: bool = True) -> Iterator[str]:
+    """
+    Generates long content by first asking for an outline, then writing its subsections concurrently.
+
+    Subsections run on the event loop of clients.run_coroutine. Every subsection shares the original messages and the
+    outline as context, and is retried on its own by clients.acreate_chat_completion on failure.
+    Subsections are yielded in order as soon as they and all the previous ones are done, so the total time follows
+    the slowest subsection rather than the total length. Closing the generator cancels the pending subsections.
+
+    Args:
+        env_path (str): The environment variable holding the OpenAI API key.
+        messages (list): The system and user messages of the request.
+        length (int): The total number of words requested.
+        use_cache (bool): Whether the outline may be answered from the response cache.
+
+    Raises:
+        ValueError: If the outline is invalid.
+        openai.OpenAIError: If a subsection still fails after the client retries.
+    """
+    outline = generate_outline(env_path, messages, length, model=model, temperature=temperature, use_cache=use_cache)
+    outline_message = {"role": "assistant", "content": json.dumps({"subsecoes": outline}, ensure_ascii=False)}
+
+    semaphore = asyncio.Semaphore(int(os.getenv("LONGFORM_MAX_CONCURRENCY", MAX_CONCURRENCY)))
+    futures = []
+    try:
+        for position, subsection in enumerate(outline, start=1):
+            prompt = SUBSECTION_PROMPT.format(position=position, count=len(outline), title=subsection.get("titulo", ""),
+                                              objective=subsection.get("objetivo", ""),
+                                              words=subsection.get("palavras", WORDS_PER_SUBSECTION))
+            subsection_messages = messages + [outline_message, {"role": "user", "content": [{"type": "text", "text": prompt}]}]
+            futures.append(clients.run_coroutine(
+                _generate_subsection(env_path, semaphore, subsection_messages, model, temperature)))
+
+        for position, future in enumerate(futures):
+            result, elapsed = future.result()
+            # Recorded here rather than on the event loop, so that metrics.collect() of the caller sees it
+            metrics.observe("longform_subsection", elapsed, position=position)
+            metrics.record_usage(result.usage, model=model)
+            yield ("\n\n" if position else "") + result.choices[0].message.content.strip()
+    finally:
+        for future in futures:
+            future.cancel()
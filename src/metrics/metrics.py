@@ -0,0 +1,210 @@
+from contextlib import contextmanager
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import threading
+import time
+
+@dataclass(frozen=True)
+class Settings:
+    """
+    The metrics settings, read from the environment on first use, so that they apply whenever the .env file is loaded.
+
+    Attributes:
+        enabled (bool): Whether METRICS_ENABLED=1; otherwise every call returns immediately.
+        path (str): Rotating JSONL file the events are written to.
+        max_bytes (int): Size of the file before it is rotated.
+        backup_count (int): Number of rotated files kept.
+        port (str): If set, a Prometheus text endpoint is served at http://localhost:<port>/metrics, from the first
+            event on.
+    """
+    enabled: bool
+    path: str
+    max_bytes: int
+    backup_count: int
+    port: Optional[str]
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        return cls(enabled=os.getenv("METRICS_ENABLED", "0") == "1",
+                   path=os.getenv("METRICS_PATH", ".cache/metrics.jsonl"),
+                   max_bytes=int(os.getenv("METRICS_MAX_BYTES", 10 * 1024 * 1024)),
+                   backup_count=int(os.getenv("METRICS_BACKUP_COUNT", 3)),
+                   port=os.getenv("METRICS_PORT"))
+
+_settings: Optional[Settings] = None
+_logger: Optional[logging.Logger] = None
+_lock = threading.Lock()
+# Aggregates exposed to Prometheus: (name, labels) -> [sum, count] for durations, value for counters
+_durations: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], List[float]] = {}
+_counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+# Events of the current collect() block, if any
+_collector: contextvars.ContextVar[Optional[List[dict]]] = contextvars.ContextVar("metrics_collector", default=None)
+
+def get_settings() -> Settings:
+    """
+    The settings of the process, read from the environment on the first call.
+    """
+    global _settings
+    if _settings is None:
+        with _lock:
+            if _settings is None:
+                _settings = Settings.from_env()
+    return _settings
+
+def enabled() -> bool:
+    """
+    Whether metrics are recorded, i.e. METRICS_ENABLED=1.
+    """
+    return get_settings().enabled
+
+def _get_logger() -> logging.Logger:
+    global _logger
+    settings = get_settings()
+    with _lock:
+        if _logger is None:
+            if os.path.dirname(settings.path):
+                os.makedirs(os.path.dirname(settings.path), exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(settings.path, maxBytes=settings.max_bytes, backupCount=settings.backup_count, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger = logging.getLogger("writer_agent.metrics")
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            logger.addHandler(handler)
+            _logger = logger
+            if settings.port:
+                _start_server(int(settings.port))
+        return _logger
+
+def _start_server(port: int) -> None:
+    """
+    Serves the Prometheus endpoint in a daemon thread. If the port is taken, e.g. by another process sharing the same
+    .env file, only the endpoint is disabled: metrics are still written to the file.
+    """
+    try:
+        server = ThreadingHTTPServer(("127.0.0.1", port), _PrometheusHandler)
+    except OSError as e:
+        logging.getLogger(__name__).warning("Metrics endpoint disabled, port %d unavailable: %s", port, e)
+        return
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+
+def _emit(event: dict) -> None:
+    event["time"] = time.time()
+    _get_logger().info(json.dumps(event, ensure_ascii=False))
+    collected = _collector.get()
+    if collected is not None:
+        collected.append(event)
+
+def observe(name: str, seconds: float, **labels) -> None:
+    """
+    Records a duration, in seconds.
+    """
+    if not enabled():
+        return
+    key = (name, tuple(sorted((label, str(label_value)) for label, label_value in labels.items())))
+    with _lock:
+        aggregate = _durations.setdefault(key, [0.0, 0])
+        aggregate[0] += seconds
+        aggregate[1] += 1
+    _emit({"type": "span", "name": name, "seconds": seconds, **labels})
+
+def count(name: str, value: float = 1, **labels) -> None:
+    """
+    Adds value to a counter, e.g. tokens, bytes or cache hits.
+    """
+    if not enabled():
+        return
+    key = (name, tuple(sorted((label, str(label_value)) for label, label_value in labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+    _emit({"type": "counter", "name": name, "value": value, **labels})
+
+class _Span:
+    __slots__ = ("name", "labels", "started")
+
+    def __init__(self, name: str, labels: dict):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self) -> "_Span":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        observe(self.name, time.perf_counter() - self.started, **self.labels)
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+def span(name: str, **labels):
+    """
+    Context manager recording the duration of a stage, e.g. `with metrics.span("pdf_extraction"):`.
+    """
+    return _Span(name, labels) if enabled() else _NULL_SPAN
+
+def record_usage(usage, **labels) -> None:
+    """
+    Counts the prompt and completion tokens of an OpenAI usage object, if any.
+    """
+    if enabled() and usage is not None:
+        count("prompt_tokens", usage.prompt_tokens, **labels)
+        count("completion_tokens", usage.completion_tokens, **labels)
+
+@contextmanager
+def collect() -> Iterator[List[dict]]:
+    """
+    Collects the events recorded by the current thread inside the block, e.g. to show them in the UI.
+    """
+    collected: List[dict] = []
+    token = _collector.set(collected)
+    try:
+        yield collected
+    finally:
+        _collector.reset(token)
+
+def _labels(labels: Tuple[Tuple[str, str], ...], **extra) -> str:
+    pairs = [(label, value) for label, value in labels] + list(extra.items())
+    return "{" + ",".join(f'{label}="{value}"' for label, value in pairs) + "}" if pairs else ""
+
+def prometheus_text() -> str:
+    """
+    The aggregated metrics in the Prometheus text exposition format.
+    """
+    lines = ["# TYPE writer_agent_stage_seconds summary"]
+    with _lock:
+        for (name, labels), (total, observations) in sorted(_durations.items()):
+            lines.append(f"writer_agent_stage_seconds_sum{_labels(labels, stage=name)} {total}")
+            lines.append(f"writer_agent_stage_seconds_count{_labels(labels, stage=name)} {observations}")
+        lines.append("# TYPE writer_agent_total counter")
+        for (name, labels), value in sorted(_counters.items()):
+            lines.append(f"writer_agent_total{_labels(labels, name=name)} {value}")
+    return "\n".join(lines) + "\n"
+
+class _PrometheusHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
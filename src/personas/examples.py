@@ -0,0 +1,179 @@
+from typing import Dict, List, Optional, Tuple
+
+import glob
+import hashlib
+import os
+import threading
+import zipfile
+
+import numpy as np
+import yaml
+
+from src.retrieval import retrieval
+
+# Maximum number of examples and approximate tokens of examples added to a prompt, unless set by
+# PERSONA_EXAMPLES_TOP_K and PERSONA_EXAMPLES_TOKEN_BUDGET
+TOP_K = 5
+TOKEN_BUDGET = 1500
+# Directory of the precomputed example vectors, unless set by PERSONA_INDEX_CACHE_DIR
+CACHE_DIR = ".cache/personas"
+
+POST = "post"
+TRANSCRIPTION = "transcription"
+
+class ExampleIndex:
+    """
+    TF-IDF vectors of the example posts and video transcriptions of a persona directory.
+
+    Examples are read from the "exemplos_de_posts" and "exemplos_de_fala" lists of <directory>/Prompts/*.yaml and from
+    <directory>/Transcriptions/*.txt. The vectors are cached on disk under PERSONA_INDEX_CACHE_DIR, along with a fingerprint of the
+    source files (path, size, modification time), and recomputed when the fingerprint changes.
+
+    Attributes:
+        directory (str): The persona directory, e.g. LinkedIn/Monica.
+        fingerprint (str): The fingerprint of the source files the index was built from.
+        texts (list): The examples.
+        kinds (list): POST or TRANSCRIPTION, for each example.
+    """
+
+    def __init__(self, directory: str, fingerprint: str, cache_dir: Optional[str] = None):
+        self.directory = directory
+        self.fingerprint = fingerprint
+        if cache_dir is None:
+            cache_dir = os.getenv("PERSONA_INDEX_CACHE_DIR", CACHE_DIR)
+
+        cache_path = os.path.join(cache_dir, f"{hashlib.sha256(os.path.abspath(directory).encode('utf-8')).hexdigest()[:16]}.npz")
+        if self.__load(cache_path):
+            return
+
+        self.texts, self.kinds = ExampleIndex.__read_examples(directory)
+        self.__build()
+        self.__save(cache_path)
+
+    def __load(self, cache_path: str) -> bool:
+        """
+        Loads the cached vectors, if they were computed from the current source files. A missing, stale or
+        unreadable (e.g. truncated) cache file is a miss.
+        """
+        try:
+            with np.load(cache_path) as cached:
+                if str(cached["fingerprint"]) != self.fingerprint:
+                    return False
+                self.texts = cached["texts"].tolist()
+                self.kinds = cached["kinds"].tolist()
+                self._vocabulary = {term: index for index, term in enumerate(cached["vocabulary"].tolist())}
+                self._idf = cached["idf"]
+                self._vectors = cached["vectors"]
+                return True
+        except (OSError, EOFError, KeyError, ValueError, zipfile.BadZipFile):
+            return False
+
+    def __save(self, cache_path: str) -> None:
+        """
+        Writes the vectors to a temporary file renamed over the cache file, so that readers, including other
+        processes, never see a partial file. The index still works in memory if the cache cannot be written.
+        """
+        temporary = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+            with open(temporary, "wb") as f:
+                np.savez(f, fingerprint=np.array(self.fingerprint), texts=np.array(self.texts, dtype=str),
+                         kinds=np.array(self.kinds, dtype=str), vocabulary=np.array(list(self._vocabulary), dtype=str),
+                         idf=self._idf, vectors=self._vectors)
+            os.replace(temporary, cache_path)
+        except OSError:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+
+    @staticmethod
+    def sources(directory: str) -> List[str]:
+        return sorted(glob.glob(os.path.join(directory, "Prompts", "*.yaml")) + glob.glob(os.path.join(directory, "Transcriptions", "*.txt")))
+
+    @staticmethod
+    def fingerprint_of(directory: str) -> str:
+        """
+        Fingerprint of the source files of a persona directory, computed from their metadata only.
+        """
+        digest = hashlib.sha256()
+        for path in ExampleIndex.sources(directory):
+            stat = os.stat(path)
+            digest.update(f"{path}:{stat.st_size}:{stat.st_mtime_ns};".encode("utf-8"))
+        return digest.hexdigest()
+
+    @staticmethod
+    def __read_examples(directory: str) -> Tuple[List[str], List[str]]:
+        texts, kinds, seen = [], [], set()
+
+        def add(text: str, kind: str) -> None:
+            text = text.strip().strip('"').strip()
+            if text and text not in seen:
+                seen.add(text)
+                texts.append(text)
+                kinds.append(kind)
+
+        for path in ExampleIndex.sources(directory):
+            with open(path, "r", encoding="utf-8") as f:
+                if path.endswith(".txt"):
+                    add(f.read(), TRANSCRIPTION)
+                    continue
+                data = yaml.safe_load(f) or {}
+            for text in data.get("exemplos_de_posts", []):
+                add(text, POST)
+            for text in data.get("exemplos_de_fala", []):
+                add(text, TRANSCRIPTION)
+        return texts, kinds
+
+    def __build(self) -> None:
+        self._vocabulary: Dict[str, int] = {}
+        documents = [[self._vocabulary.setdefault(term, len(self._vocabulary)) for term in retrieval.tokenize(text)] for text in self.texts]
+
+        counts = np.zeros((len(documents), len(self._vocabulary)), dtype=np.float32)
+        for row, term_ids in enumerate(documents):
+            np.add.at(counts[row], term_ids, 1)
+        self._idf = np.log((1 + len(documents)) / (1 + (counts > 0).sum(axis=0))).astype(np.float32) + 1
+        self._vectors = ExampleIndex.__normalize(np.log1p(counts) * self._idf)
+
+    @staticmethod
+    def __normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def select(self, query: str, top_k: Optional[int] = None, token_budget: Optional[int] = None) -> List[Tuple[str, str]]:
+        """
+        Returns the (kind, text) examples most similar to query, at most top_k of them and within about token_budget
+        tokens, most similar first. Both default to the PERSONA_EXAMPLES_* environment variables.
+        """
+        if top_k is None:
+            top_k = int(os.getenv("PERSONA_EXAMPLES_TOP_K", TOP_K))
+        if token_budget is None:
+            token_budget = int(os.getenv("PERSONA_EXAMPLES_TOKEN_BUDGET", TOKEN_BUDGET))
+        counts = np.zeros(len(self._vocabulary), dtype=np.float32)
+        for term in retrieval.tokenize(query):
+            if term in self._vocabulary:
+                counts[self._vocabulary[term]] += 1
+        scores = self._vectors @ ExampleIndex.__normalize(np.log1p(counts) * self._idf) if len(self.texts) else np.zeros(0)
+
+        selected, used = [], 0
+        for index in np.argsort(-scores, kind="stable").tolist():
+            if len(selected) == top_k:
+                break
+            cost = retrieval.estimate_tokens(self.texts[index])
+            if used + cost <= token_budget:
+                selected.append((self.kinds[index], self.texts[index]))
+                used += cost
+        return selected
+
+_indexes: Dict[str, ExampleIndex] = {}
+_indexes_lock = threading.Lock()
+
+def get_index(directory: str) -> ExampleIndex:
+    """
+    Returns the example index of a persona directory, rebuilding it only when its source files changed.
+    """
+    fingerprint = ExampleIndex.fingerprint_of(directory)
+    with _indexes_lock:
+        index = _indexes.get(directory)
+        if index is None or index.fingerprint != fingerprint:
+            index = ExampleIndex(directory, fingerprint)
+            _indexes[directory] = index
+        return index
@@ -1,7 +1,17 @@
-from typing import List
+from typing import Dict, List, Optional
+
+import glob
+import os
+import threading
+
+import yaml
+
+# Repository root, holding the LinkedIn/<Persona> directories
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 class Persona:
-    def __init__(self, name: str, area: str, characteristics: str, writing_style: str, talking_style: str, video_transcriptions: (List[str] | None) = None):
+    def __init__(self, name: str, area: str, characteristics: str, writing_style: str, talking_style: str, video_transcriptions: (List[str] | None) = None,
+                 directory: (str | None) = None):
         self.name: str = name  # Mônica Hauck
 
         self.area: str = area  # CEO da Sólides S.A., empresa de tecnologia de RH
@@ -11,9 +21,10 @@ class Persona:
         self.talking_style: str = talking_style  # Fala com energia, sempre animada e alegre, é a alma das reuniões
 
         self.video_transcriptions = video_transcriptions
+        self.directory = directory  # LinkedIn/Monica, with example posts in Prompts/*.yaml and transcriptions in Transcriptions/
 
-    def __str__(self) -> str:
-        return f"""
+        # Compiled once: the same persona always yields the same bytes, so prompts starting with it can be cached by the provider
+        self.block: str = f"""
             "{self.name}" é "{self.area}".
             Age de forma "{self.characteristics}".
             Sua forma de escrita é "{self.writing_style}".
@@ -21,33 +32,78 @@ class Persona:
             {f"Aqui estão alguns exemplos de transcrições de vídeos dessa pessoa falando: '{self.video_transcriptions}'" if self.video_transcriptions else ""}
             
         """.strip().replace("\t", "").replace("\n", "")
+
+    @staticmethod
+    def from_dict(data: dict, directory: str) -> "Persona":
+        """
+        Builds a persona from the content of its persona.yaml file, located in directory.
+
+        Raises:
+            KeyError: If a required field is missing.
+        """
+        return Persona(data["nome"], data["area"], data["caracteristicas"], data["estilo_de_escrita"], data["estilo_de_fala"],
+                       data.get("transcricoes"), directory=directory)
+
+    def examples(self, query: str) -> str:
+        """
+        The example posts and transcriptions of the persona directory most similar to query, within a token budget,
+        or an empty string if the persona has no directory or examples.
+        """
+        if not self.directory:
+            return ""
+        from src.personas import examples  # NumPy is only needed once a request is made
+
+        selected = examples.get_index(self.directory).select(query)
+        video_transcriptions = [text for kind, text in selected if kind == examples.TRANSCRIPTION]
+        posts = [text for kind, text in selected if kind == examples.POST]
+
+        return f"""
+            {f"Aqui estão alguns exemplos de transcrições de vídeos de {self.name} falando: '{video_transcriptions}'" if video_transcriptions else ""}
+            {f"Aqui estão alguns exemplos de posts de {self.name}: '{posts}'" if posts else ""}
+        """.strip().replace("\t", "").replace("\n", "")
+
+    def __str__(self) -> str:
+        return self.block
     
 
-persona_instances = {
-    "Mônica Hauck": Persona(
-        "Mônica Hauck",
-        "CEO da Sólides S.A., empresa de tecnologia de RH",
-        "Enérgica, direta, gosta de falar de experiências pessoais, formada em história",
-        "Escrita direta, sem jargões ou rodeios excessivos, detesta LinkeDisney",
-        "Fala com energia, sempre animada e alegre, é a alma das reuniões",
-        [
-            "A gente quer atrair os melhores talentos. Então, você vê ali uma descrição de vagas que são lindas, absolutamente fantasiosas. Você faz um desenho de uma empresa que muitas vezes não existe. E o candidato, na mesma dança, no mesmo jogo, ele também projeta uma imagem que não é uma imagem... Não é que ela não seja verdadeira, mas ela é uma projeção daquilo que o candidato está vendo. Ele está vendo ali o seu melhor ângulo. Então, você entra num jogo ali onde nem a empresa e nem o candidato são transparentes o suficiente. E aí isso perde-se muito tempo e muita energia, e isso gera muita frustração dos dois lados.",
-            "Porque adianta você escalar uma montanha e tá lá no topo, você ferido, todo mundo em volta ferido, você vai comemorar o quê? O que você vai enxergar? Então não é só sobre chegar no topo da montanha, é como você chega também. Só que isso dá mais trabalho. É mais fácil você focar só em subir na montanha? Ou é mais fácil você desistir da ambição de subir da montanha e se esconder atrás? Não, vamos ser humanos, pra que subir a montanha? Vamos ficar aqui nos abraçando aqui embaixo mesmo, porque é mais confortável. Subir a montanha da forma correta é o caminho mais difícil, mas para mim é o que vale a pena.",
-            "Mesmo nos momentos mais difíceis, eu acho muito importante você ter essa firme determinação de fazer o que precisa ser feito, caminhar, e continuar andando, continuar seguindo, né? Porque existem os dias maus, mas eles não duram pra sempre. Eu lembro que na época eu não via assim, eu não conseguia visualizar os dias bons. Mas eles... passa o tempo, eles vêm."
-        ]
-    ),
-    "Alessandro Vieira": Persona(
-        "Alessandro Vieira",
-        "Fundador e Co-CEO da Sólides S.A., empresa de tecnologia de RH",
-        "Calmo, reservado, inteligente, formado em estatística",
-        "Escrita com pouco jargão, mais técnica",
-        "Fala com calma, de modo controlado"
-    ),
-    "Persona Neutra": Persona(
-        "Persona Neutra",
-        "Nenhuma área, completamento neutro",
-        "Neutro",
-        "Escrita neutra",
-        "Fala neutra"
-    )
-}
+class PersonaStore:
+    """
+    The personas described by the <root>/<Persona>/persona.yaml files, loaded on first access.
+
+    Attributes:
+        root (str): The directory of the persona directories.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._personas: Optional[Dict[str, Persona]] = None
+        self._lock = threading.Lock()
+
+    def __load(self) -> Dict[str, Persona]:
+        with self._lock:
+            if self._personas is None:
+                loaded = []
+                for path in glob.glob(os.path.join(self.root, "*", "persona.yaml")):
+                    with open(path, "r", encoding="utf-8") as f:
+                        data = yaml.safe_load(f)
+                    loaded.append((data.get("ordem", float("inf")), path, Persona.from_dict(data, os.path.dirname(path))))
+                self._personas = {persona.name: persona for _, _, persona in sorted(loaded, key=lambda item: item[:2])}
+            return self._personas
+
+    def names(self) -> List[str]:
+        return list(self.__load())
+
+    def get(self, name: str) -> Persona:
+        """
+        Raises:
+            KeyError: If there is no persona with this name.
+        """
+        return self.__load()[name]
+
+store = PersonaStore(os.path.join(BASE_DIR, "LinkedIn"))
+
+def persona_names() -> List[str]:
+    return store.names()
+
+def get_persona(name: str) -> Persona:
+    return store.get(name)
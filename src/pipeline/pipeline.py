@@ -0,0 +1,223 @@
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Iterator, List, Optional
+
+import importlib
+import os
+
+from src.metrics import metrics
+from src.personas import personas as module_personas
+from src.prompts import prompts
+
+if TYPE_CHECKING:
+    from src.documents import documents
+    from src.images import images as module_images
+
+# Imported on first use, see preload: pypdfium2, Pillow and the OpenAI SDK take about a second to import, which
+# would otherwise delay the first render of the form
+HEAVY_MODULES = ("src.documents.documents", "src.images.images", "src.longform.longform", "src.retrieval.retrieval", "src.utils.utils")
+
+LINKEDIN_POST = "Post de LinkedIn"
+BOOK_SECTION = "Seção de Livro"
+
+# Environment variables holding the (system prompt, user prompt template) paths of each kind of content
+PROMPT_ENV_VARS = {
+    LINKEDIN_POST: ("LINKEDIN_SYSTEM_PROMPT_PATH", "LINKEDIN_USER_PROMPT_TEMPLATE_PATH"),
+    BOOK_SECTION: ("BOOK_SYSTEM_PROMPT_PATH", "BOOK_USER_PROMPT_TEMPLATE_PATH"),
+}
+
+NOT_SPECIFIED = "Não especificado"
+
+# Repository root, holding the LinkedIn/ and Book/ prompt directories
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@dataclass
+class Attachment:
+    """
+    A file attached to a request, either a PDF or an image.
+    """
+    name: str
+    data: bytes
+
+    @property
+    def is_pdf(self) -> bool:
+        return self.name.split(".")[-1].lower() == "pdf"
+
+class AttachmentError(ValueError):
+    """
+    Raised when attachments cannot be read, e.g. a corrupt PDF or a file that is not a supported image.
+    """
+
+@dataclass
+class ContentRequest:
+    """
+    The fields of the generation form.
+
+    Attributes:
+        option (str): The kind of content, LINKEDIN_POST or BOOK_SECTION.
+        style (str): The name of the persona writing the content, see personas.persona_names.
+        long_form (bool): Whether to generate an outline and then its subsections in parallel.
+    """
+    option: str
+    theme: str
+    title: str
+    objective: str
+    keywords: str = ""
+    length: Optional[int] = None
+    tone: str = ""
+    target: List[str] = field(default_factory=list)
+    style: str = ""
+    text_area: str = ""
+    attachments: List[Attachment] = field(default_factory=list)
+    long_form: bool = False
+
+@dataclass
+class PreparedRequest:
+    """
+    The messages of a request, ready to be sent, and how they were built.
+
+    Attributes:
+        messages (list): The system and user messages.
+        documents (list): The PDF attachments extracted.
+        doc_tokens (int): Approximate tokens of the extracted PDF text.
+        selected_doc_tokens (int): Approximate tokens of the PDF text kept in the prompt.
+        images (list): The image attachments sent, without duplicates.
+        duplicate_images (int): Number of image attachments dropped as duplicates.
+    """
+    messages: List[dict]
+    documents: List["documents.ExtractedDocument"]
+    doc_tokens: int
+    selected_doc_tokens: int
+    images: List["module_images.EncodedImage"]
+    duplicate_images: int
+
+    @property
+    def image_bytes_saved(self) -> int:
+        return sum(image.original_size - image.encoded_size for image in self.images)
+
+def preload() -> None:
+    """
+    Imports the modules prepare and generate need, e.g. from a background thread while the form is being filled.
+    """
+    for name in HEAVY_MODULES:
+        importlib.import_module(name)
+
+def create_prompt_registry() -> prompts.PromptRegistry:
+    """
+    Loads the prompts under the LinkedIn/ and Book/ directories of the repository.
+    """
+    return prompts.PromptRegistry([os.path.join(BASE_DIR, "LinkedIn"), os.path.join(BASE_DIR, "Book")])
+
+def get_prompt(registry: prompts.PromptRegistry, env_var: str, user_template: bool = False) -> prompts.PromptTemplate:
+    """
+    Returns the prompt whose path is in the env_var environment variable, checked against the supplied fields if it
+    is a user template.
+
+    Raises:
+        prompts.PromptTemplateError: If the environment variable is not set, points to a missing file, or the prompt
+            is invalid.
+    """
+    path = os.getenv(env_var)
+    if not path:
+        raise prompts.PromptTemplateError(f"A variável de ambiente {env_var} não está definida.")
+    try:
+        return registry.get_template(path) if user_template else registry.get(path)
+    except FileNotFoundError as e:
+        raise prompts.PromptTemplateError(f"A variável de ambiente {env_var} aponta para um arquivo inexistente: {path}") from e
+
+def prepare(request: ContentRequest, registry: prompts.PromptRegistry) -> PreparedRequest:
+    """
+    Extracts the attachments and builds the messages of a request.
+
+    Raises:
+        AttachmentError: Listing every attachment that could not be read.
+        prompts.PromptTemplateError: If a prompt is missing or invalid.
+    """
+    from src.documents import documents
+    from src.images import images as module_images
+    from src.retrieval import retrieval
+
+    doc_content = ""
+    extracted = []
+    errors = []
+    for attachment in request.attachments:
+        metrics.count("attachment_bytes", len(attachment.data), kind="pdf" if attachment.is_pdf else "image")
+        if attachment.is_pdf:
+            try:
+                document = documents.extract_pdf(attachment.name, attachment.data)
+            except documents.DocumentError as e:
+                errors.append(str(e))
+                continue
+            metrics.observe("pdf_extraction", document.elapsed, pages=document.page_count, cached=document.cached)
+            doc_content += document.text
+            extracted.append(document)
+
+    image_attachments = [(attachment.name, attachment.data) for attachment in request.attachments if not attachment.is_pdf]
+    with metrics.span("image_encoding", images=len(image_attachments)):
+        try:
+            encoded_images = module_images.encode_images(image_attachments)
+        except module_images.ImageDecodeError as e:
+            errors.append(str(e))
+    if errors:
+        raise AttachmentError(f"Não foi possível ler os anexos: {'; '.join(errors)}")
+    images = [{"type": "image_url", "image_url": {"url": image.data_url}} for image in encoded_images]
+
+    doc_tokens = retrieval.estimate_tokens(doc_content)
+    if doc_content:
+        with metrics.span("retrieval"):
+            doc_content = retrieval.select_relevant(doc_content, " ".join([request.theme, request.title, request.objective, request.keywords]))
+
+    with metrics.span("prompt_assembly"):
+        messages = _assemble(request, registry, doc_content, images)
+
+    return PreparedRequest(messages, extracted, doc_tokens, retrieval.estimate_tokens(doc_content),
+                           encoded_images, len(image_attachments) - len(encoded_images))
+
+def _assemble(request: ContentRequest, registry: prompts.PromptRegistry, doc_content: str, images: List[dict]) -> List[dict]:
+    """
+    Builds the system and user messages of a request from its selected supporting content and encoded images.
+    """
+    persona = module_personas.get_persona(request.style) if request.style else None
+
+    system_env_var, user_env_var = PROMPT_ENV_VARS[request.option]
+    system_prompt = get_prompt(registry, system_env_var).text
+    user_prompt = get_prompt(registry, user_env_var, user_template=True).format(
+        theme=request.theme if request.theme else NOT_SPECIFIED,
+        title=request.title if request.title else NOT_SPECIFIED,
+        objective=request.objective if request.objective else NOT_SPECIFIED,
+        keywords=request.keywords if request.keywords else NOT_SPECIFIED,
+        length=request.length if request.length else NOT_SPECIFIED,
+        tone=request.tone if request.tone else NOT_SPECIFIED,
+        target=request.target if request.target else NOT_SPECIFIED,
+        style=f"{persona.name} (persona descrita nas instruções)" if persona else NOT_SPECIFIED,
+        text_area=request.text_area if request.text_area else NOT_SPECIFIED,
+        doc_content=doc_content if doc_content else NOT_SPECIFIED
+    )
+
+    # The system prompt and the persona block come first and never vary for a given persona, so that this prefix of
+    # the request can be cached by the provider; everything specific to the request comes after it
+    system_content = [{"type": "text", "text": system_prompt}]
+    user_content = [{"type": "text", "text": user_prompt}]
+    if persona:
+        system_content.append({"type": "text", "text": persona.block})
+        persona_examples = persona.examples(" ".join([request.theme, request.objective, request.keywords]))
+        if persona_examples:
+            user_content.append({"type": "text", "text": persona_examples})
+
+    messages = [{
+        "role": "system",
+        "content": system_content
+    }, {
+        "role": "user",
+        "content": user_content + images
+    }]
+    return messages
+
+def generate(request: ContentRequest, prepared: PreparedRequest, use_cache: bool = True) -> Iterator[str]:
+    """
+    Streams the content generated for a prepared request.
+    """
+    if request.long_form:
+        from src.longform import longform
+        return longform.generate_long_form_stream("OPENAI_API_KEY", prepared.messages, request.length, use_cache=use_cache)
+    from src.utils import utils
+    return utils.get_text_response_stream("OPENAI_API_KEY", prepared.messages, use_cache=use_cache)
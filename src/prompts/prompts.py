@@ -0,0 +1,144 @@
+from typing import Dict, FrozenSet, List, Optional
+
+import glob
+import os
+import string
+import threading
+
+import yaml
+
+# Fields supplied by the pipeline to user_prompt.format(...)
+USER_TEMPLATE_FIELDS: FrozenSet[str] = frozenset({
+    "theme", "title", "objective", "keywords", "length", "tone", "target", "style", "text_area", "doc_content"
+})
+
+# Prompt files looked up under each root directory
+PROMPT_PATTERNS = ("**/*prompt*.txt", "**/*.yaml", "**/*.yml")
+
+class PromptTemplateError(ValueError):
+    """
+    Raised when a prompt file cannot be parsed, or a user template does not match the supplied fields.
+    """
+
+class PromptTemplate:
+    """
+    A prompt file loaded in memory.
+
+    Attributes:
+        path (str): The absolute path to the prompt file.
+        text (str): The raw content of the file.
+        data (dict | None): The parsed content, for YAML prompts.
+        mtime (float): The modification time of the file when it was loaded.
+    """
+
+    def __init__(self, path: str):
+        self.path: str = path
+        self.mtime: float = os.stat(path).st_mtime
+        with open(path, "r", encoding="utf-8") as f:
+            self.text: str = f.read()
+
+        self.data: Optional[dict] = None
+        self._placeholders: Optional[FrozenSet[str]] = None
+        if path.endswith((".yaml", ".yml")):
+            try:
+                self.data = yaml.safe_load(self.text)
+            except yaml.YAMLError as e:
+                raise PromptTemplateError(f"Invalid YAML prompt '{path}': {e}") from e
+            if not isinstance(self.data, dict):
+                raise PromptTemplateError(f"YAML prompt '{path}' must be a mapping.")
+
+    @property
+    def placeholders(self) -> FrozenSet[str]:
+        """
+        The .format fields the template expects. Only meaningful for user templates: other prompts, such as system
+        prompts, are sent as they are and may contain literal braces.
+
+        Raises:
+            PromptTemplateError: If a placeholder is malformed or positional.
+        """
+        if self._placeholders is None:
+            try:
+                names = [name for _, name, _, _ in string.Formatter().parse(self.text) if name is not None]
+            except ValueError as e:
+                raise PromptTemplateError(f"Malformed placeholder in prompt '{self.path}': {e}") from e
+            if any(not name.isidentifier() for name in names):
+                raise PromptTemplateError(f"Prompt '{self.path}' must only use named placeholders, got {names}")
+            self._placeholders = frozenset(names)
+        return self._placeholders
+
+    def check(self, fields: FrozenSet[str]) -> "PromptTemplate":
+        """
+        Checks that the template expects exactly the given fields, and returns it.
+
+        Raises:
+            PromptTemplateError: If the template expects fields that are not supplied, or ignores supplied fields.
+        """
+        unknown, unused = self.placeholders - fields, fields - self.placeholders
+        if unknown or unused:
+            problems = []
+            if unknown:
+                problems.append(f"expects fields that are not supplied: {sorted(unknown)}")
+            if unused:
+                problems.append(f"does not use the supplied fields: {sorted(unused)}")
+            raise PromptTemplateError(f"Prompt '{self.path}' {'; '.join(problems)}")
+        return self
+
+    def format(self, **fields) -> str:
+        return self.text.format(**fields)
+
+class PromptRegistry:
+    """
+    Loads and parses all prompt files under the given root directories once.
+
+    Lookups only hit the disk with a stat, to reload a file whose modification time changed. A file that fails to
+    load is not registered, so that it only fails the requests that use it.
+
+    Attributes:
+        roots (list): The directories searched for prompt files.
+        fields (frozenset): The fields supplied to user templates.
+    """
+
+    def __init__(self, roots: List[str], fields: FrozenSet[str] = USER_TEMPLATE_FIELDS):
+        self.roots = roots
+        self.fields = fields
+        self._templates: Dict[str, PromptTemplate] = {}
+        self._lock = threading.Lock()
+
+        for root in roots:
+            for pattern in PROMPT_PATTERNS:
+                for path in glob.glob(os.path.join(root, pattern), recursive=True):
+                    path = os.path.abspath(path)
+                    try:
+                        self._templates[path] = PromptTemplate(path)
+                    except PromptTemplateError:
+                        pass  # raised again by get
+
+    def get(self, path: str) -> PromptTemplate:
+        """
+        Returns the prompt at path, loading it if it is not registered yet or was modified on disk.
+
+        Raises:
+            FileNotFoundError: If the prompt file does not exist.
+            PromptTemplateError: If the prompt file is invalid.
+        """
+        path = os.path.abspath(path)
+        mtime = os.stat(path).st_mtime
+        with self._lock:
+            template = self._templates.get(path)
+            if template is None or template.mtime != mtime:
+                template = PromptTemplate(path)
+                self._templates[path] = template
+            return template
+
+    def get_template(self, path: str) -> PromptTemplate:
+        """
+        Returns the user template at path, checked against the supplied fields.
+
+        Raises:
+            FileNotFoundError: If the prompt file does not exist.
+            PromptTemplateError: If the prompt file is invalid or does not match the supplied fields.
+        """
+        return self.get(path).check(self.fields)
+
+    def __len__(self) -> int:
+        return len(self._templates)
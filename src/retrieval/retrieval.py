@@ -0,0 +1,125 @@
+from typing import List, Optional
+
+import os
+import re
+import unicodedata
+
+import numpy as np
+
+# Approximate token budget for the supporting content pasted in the prompt, unless set by DOC_CONTENT_TOKEN_BUDGET
+TOKEN_BUDGET = 3000
+# Maximum number of chunks kept, unless set by DOC_CONTENT_TOP_K
+TOP_K = 8
+CHUNK_WORDS = 200
+CHUNK_OVERLAP = 40
+
+_WORD = re.compile(r"\w+")
+
+def tokenize(text: str) -> List[str]:
+    """
+    Splits text into lowercase, accent-free terms of at least 3 characters.
+    """
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return [term for term in _WORD.findall(text) if len(term) > 2]
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count of a text, about 4 characters per token.
+    """
+    return len(text) // 4
+
+def split_chunks(text: str, words: int = CHUNK_WORDS, overlap: int = CHUNK_OVERLAP) -> List[str]:
+    """
+    Splits text into chunks of the given number of words, consecutive chunks sharing overlap words.
+    """
+    tokens = text.split()
+    step = max(words - overlap, 1)
+    return [" ".join(tokens[start:start + words]) for start in range(0, max(len(tokens) - overlap, 1), step)]
+
+class BM25Index:
+    """
+    In-memory BM25 index over a list of chunks, stored as flat NumPy arrays of (chunk, term) occurrences.
+
+    Attributes:
+        chunks (list): The indexed chunks.
+    """
+
+    def __init__(self, chunks: List[str], k1: float = 1.5, b: float = 0.75):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+
+        self._vocabulary = {}
+        term_ids, chunk_ids = [], []
+        for index, chunk in enumerate(chunks):
+            for term in tokenize(chunk):
+                term_ids.append(self._vocabulary.setdefault(term, len(self._vocabulary)))
+                chunk_ids.append(index)
+        self._term_ids = np.array(term_ids, dtype=np.int64)
+        self._chunk_ids = np.array(chunk_ids, dtype=np.int64)
+
+        self._lengths = np.bincount(self._chunk_ids, minlength=len(chunks)).astype(np.float64)
+        self._average_length = self._lengths.mean() if len(chunks) else 0.0
+
+    def scores(self, query: str) -> np.ndarray:
+        """
+        Returns the BM25 score of every chunk for the query.
+        """
+        query_ids = sorted({self._vocabulary[term] for term in tokenize(query) if term in self._vocabulary})
+        scores = np.zeros(len(self.chunks))
+        if not query_ids or not self._average_length:
+            return scores
+
+        mask = np.isin(self._term_ids, query_ids)
+        columns = np.searchsorted(query_ids, self._term_ids[mask])
+        frequencies = np.zeros((len(self.chunks), len(query_ids)))
+        np.add.at(frequencies, (self._chunk_ids[mask], columns), 1)
+
+        document_frequencies = (frequencies > 0).sum(axis=0)
+        idf = np.log(1 + (len(self.chunks) - document_frequencies + 0.5) / (document_frequencies + 0.5))
+        norm = self.k1 * (1 - self.b + self.b * self._lengths / self._average_length)
+        scores = (idf * frequencies * (self.k1 + 1) / (frequencies + norm[:, None])).sum(axis=1)
+        return scores
+
+def select_relevant(text: str, query: str, token_budget: Optional[int] = None, top_k: Optional[int] = None) -> str:
+    """
+    Keeps only the chunks of text most relevant to query, within a token budget.
+
+    Texts that already fit the budget are returned unchanged. Otherwise, the top_k best BM25 chunks that fit the
+    budget are returned in their original order, separated by "[...]". If not even one chunk fits, the beginning of
+    the best one is kept, so that the attachments are never dropped altogether.
+
+    Args:
+        text (str): The supporting content extracted from the attachments.
+        query (str): The request fields to rank against (theme, title, objective, keywords).
+        token_budget (int): Approximate maximum number of tokens returned, DOC_CONTENT_TOKEN_BUDGET by default.
+        top_k (int): Maximum number of chunks returned, DOC_CONTENT_TOP_K by default.
+
+    Returns:
+        str: The selected content.
+    """
+    if token_budget is None:
+        token_budget = int(os.getenv("DOC_CONTENT_TOKEN_BUDGET", TOKEN_BUDGET))
+    if top_k is None:
+        top_k = int(os.getenv("DOC_CONTENT_TOP_K", TOP_K))
+    if estimate_tokens(text) <= token_budget:
+        return text
+
+    chunks = split_chunks(text)
+    scores = BM25Index(chunks).scores(query)
+
+    selected, used = [], 0
+    for index in np.argsort(-scores, kind="stable"):
+        if len(selected) == top_k:
+            break
+        cost = estimate_tokens(chunks[index])
+        if used + cost <= token_budget:
+            selected.append(index)
+            used += cost
+
+    if not selected and top_k > 0:
+        best = chunks[int(np.argsort(-scores, kind="stable")[0])]
+        return best[:token_budget * 4].rsplit(" ", 1)[0]
+
+    return "\n[...]\n".join(chunks[index] for index in sorted(selected))
@@ -0,0 +1,191 @@
+from concurrent.futures import Future
+from email.utils import parsedate_to_datetime
+from typing import Any, Coroutine, Dict, Mapping, Optional
+
+import asyncio
+import os
+import random
+import threading
+import time
+
+import openai
+
+# Defaults of the settings below, read from the environment on use rather than at import
+# Seconds to wait for a response (connection, read and write), OPENAI_TIMEOUT
+TIMEOUT = 120.0
+# Retries after a rate limit, server error, timeout or connection error, OPENAI_MAX_RETRIES
+MAX_RETRIES = 4
+# Requests per second allowed to the API by this process (0 disables the limiter) and burst size, OPENAI_RATE_LIMIT
+# and OPENAI_RATE_LIMIT_BURST
+RATE_LIMIT = 5.0
+RATE_LIMIT_BURST = 10
+# Backoff base and cap, in seconds. The cap also bounds the Retry-After delays asked by the server
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+
+class TokenBucket:
+    """
+    A thread-safe token bucket: tokens are refilled at rate per second, up to capacity, and each request takes one.
+
+    Attributes:
+        rate (float): Tokens added per second. 0 disables the limiter.
+        capacity (int): Maximum number of tokens, that is, the largest burst allowed.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """
+        Takes a token, possibly in advance, returning how long the caller must wait before using it.
+        """
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+    def acquire(self) -> None:
+        time.sleep(self._reserve())
+
+    async def acquire_async(self) -> None:
+        await asyncio.sleep(self._reserve())
+
+# Shared by all the Streamlit sessions of the process, see get_rate_limiter
+_rate_limiter: Optional[TokenBucket] = None
+_rate_limiter_lock = threading.Lock()
+
+_clients: Dict[str, openai.OpenAI] = {}
+_async_clients: Dict[str, openai.AsyncOpenAI] = {}
+_clients_lock = threading.Lock()
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+def get_rate_limiter() -> TokenBucket:
+    """
+    Returns the process-wide rate limiter, configured by the OPENAI_RATE_LIMIT and OPENAI_RATE_LIMIT_BURST environment
+    variables.
+    """
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = TokenBucket(float(os.getenv("OPENAI_RATE_LIMIT", RATE_LIMIT)),
+                                        int(os.getenv("OPENAI_RATE_LIMIT_BURST", RATE_LIMIT_BURST)))
+        return _rate_limiter
+
+def get_client(env_path: str = "OPENAI_API_KEY") -> openai.OpenAI:
+    """
+    Returns the process-wide sync client for the API key in the env_path environment variable.
+
+    Reusing the client keeps its pooled HTTP connections alive between requests. Retries are handled by this module,
+    not by the client.
+    The API base URL can be overridden with the OPENAI_BASE_URL environment variable, e.g. to point at a local stub.
+    """
+    with _clients_lock:
+        if env_path not in _clients:
+            _clients[env_path] = openai.OpenAI(api_key=os.getenv(env_path, ""), timeout=float(os.getenv("OPENAI_TIMEOUT", TIMEOUT)),
+                                               max_retries=0)
+        return _clients[env_path]
+
+def get_async_client(env_path: str = "OPENAI_API_KEY") -> openai.AsyncOpenAI:
+    """
+    Returns the process-wide async client for the API key in the env_path environment variable.
+
+    Its connections belong to the event loop of run_coroutine, so it must only be awaited on that loop.
+    """
+    with _clients_lock:
+        if env_path not in _async_clients:
+            _async_clients[env_path] = openai.AsyncOpenAI(api_key=os.getenv(env_path, ""),
+                                                          timeout=float(os.getenv("OPENAI_TIMEOUT", TIMEOUT)), max_retries=0)
+        return _async_clients[env_path]
+
+def run_coroutine(coroutine: Coroutine) -> Future:
+    """
+    Schedules a coroutine on the process-wide event loop, running in a daemon thread, and returns its future.
+
+    Cancelling the future cancels the coroutine.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="openai-event-loop", daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coroutine, _loop)
+
+def _retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    """
+    Parses the retry-after-ms or retry-after (seconds or HTTP date) header, if any.
+    """
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(headers["retry-after"]).timestamp() - time.time())
+        except (KeyError, TypeError, ValueError):
+            pass
+    return None
+
+def _retry_delay(error: Exception, attempt: int) -> Optional[float]:
+    """
+    Returns how long to wait before retrying after error, or None if the error must not be retried.
+
+    Honours the Retry-After header of the response, up to BACKOFF_MAX, falling back to jittered exponential backoff.
+    """
+    if isinstance(error, openai.APIStatusError):
+        if error.status_code != 429 and error.status_code < 500:
+            return None
+        delay = _retry_after(error.response.headers)
+        if delay is not None:
+            return min(delay, BACKOFF_MAX)
+    elif not isinstance(error, openai.APIConnectionError):  # includes APITimeoutError
+        return None
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+def create_chat_completion(env_path: str = "OPENAI_API_KEY", **kwargs) -> Any:
+    """
+    Calls chat.completions.create with rate limiting and retries on 429, 5xx, timeouts and connection errors.
+
+    With stream=True, only opening the stream is retried.
+
+    Raises:
+        openai.OpenAIError: If the request fails with a non retryable error or after OPENAI_MAX_RETRIES retries.
+    """
+    max_retries = int(os.getenv("OPENAI_MAX_RETRIES", MAX_RETRIES))
+    for attempt in range(max_retries + 1):
+        get_rate_limiter().acquire()
+        try:
+            return get_client(env_path).chat.completions.create(**kwargs)
+        except openai.OpenAIError as e:
+            delay = _retry_delay(e, attempt)
+            if delay is None or attempt == max_retries:
+                raise
+            time.sleep(delay)
+
+async def acreate_chat_completion(env_path: str = "OPENAI_API_KEY", **kwargs) -> Any:
+    """
+    Async version of create_chat_completion, to be awaited on the event loop of run_coroutine.
+
+    Raises:
+        openai.OpenAIError: If the request fails with a non retryable error or after OPENAI_MAX_RETRIES retries.
+    """
+    max_retries = int(os.getenv("OPENAI_MAX_RETRIES", MAX_RETRIES))
+    for attempt in range(max_retries + 1):
+        await get_rate_limiter().acquire_async()
+        try:
+            return await get_async_client(env_path).chat.completions.create(**kwargs)
+        except openai.OpenAIError as e:
+            delay = _retry_delay(e, attempt)
+            if delay is None or attempt == max_retries:
+                raise
+            await asyncio.sleep(delay)
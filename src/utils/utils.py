@@ -1,20 +1,194 @@
-from typing import List
-from dotenv import load_dotenv
+from typing import Iterator, List, Optional
 
+import hashlib
+import json
 import os
+import sqlite3
+import threading
+import time
 
-import openai
+from src.metrics import metrics
+from src.utils import clients
 
-load_dotenv()
+class ResponseCache:
+    """
+    Content-addressed cache of LLM responses, stored in a local SQLite file.
+
+    Entries are keyed by a stable hash of the request (see ResponseCache.key) and evicted when older than ttl seconds,
+    or, least recently used first, when the cached responses exceed max_bytes in total.
+
+    Attributes:
+        path (str): The path to the SQLite file.
+        ttl (float): Time to live of an entry, in seconds.
+        max_bytes (int): Maximum total size of the cached responses, in bytes.
+        hits (int): Number of lookups answered from the cache in this process.
+        misses (int): Number of lookups not found in the cache in this process.
+    """
+
+    def __init__(self, path: str, ttl: float = 7 * 24 * 3600, max_bytes: int = 50 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._connection.commit()
+
+    @staticmethod
+    def key(model: str, temperature: float, n: int, messages: List[dict]) -> str:
+        """
+        Builds the cache key of a request.
+
+        Messages are normalized first: plain string contents become a single text part and base64 data URLs of images
+        are replaced by their SHA-256 digest, so the key stays small and independent of dict ordering.
+        """
+        normalized = []
+        for message in messages:
+            content = message["content"]
+            if isinstance(content, str):
+                content = [{"type": "text", "text": content}]
+            parts = []
+            for part in content:
+                if part.get("type") == "image_url" and part["image_url"]["url"].startswith("data:"):
+                    digest = hashlib.sha256(part["image_url"]["url"].encode("utf-8")).hexdigest()
+                    part = {**part, "image_url": {**part["image_url"], "url": f"sha256:{digest}"}}
+                parts.append(part)
+            normalized.append({**message, "content": parts})
+
+        payload = json.dumps({"model": model, "temperature": temperature, "n": n, "messages": normalized},
+                             sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Returns the cached response for key, or None if it is missing or expired.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value FROM responses WHERE key = ? AND created_at >= ?", (key, now - self.ttl)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                metrics.count("response_cache", result="miss")
+                return None
+            self._connection.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._connection.commit()
+            self.hits += 1
+            metrics.count("response_cache", result="hit")
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        """
+        Stores value under key, then evicts expired entries and, if needed, the least recently used ones.
+        """
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now)
+            )
+            self._connection.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+
+            total = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                evicted = []
+                for old_key, old_size in self._connection.execute(
+                        "SELECT key, size FROM responses ORDER BY accessed_at ASC").fetchall():
+                    if total <= self.max_bytes:
+                        break
+                    evicted.append((old_key,))
+                    total -= old_size
+                self._connection.executemany("DELETE FROM responses WHERE key = ?", evicted)
+            self._connection.commit()
+
+_response_cache: Optional[ResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+def get_response_cache() -> ResponseCache:
+    """
+    Returns the process-wide response cache, configured by the RESPONSE_CACHE_PATH, RESPONSE_CACHE_TTL (seconds)
+    and RESPONSE_CACHE_MAX_BYTES environment variables.
+    """
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache(
+                os.getenv("RESPONSE_CACHE_PATH", ".cache/responses.sqlite3"),
+                ttl=float(os.getenv("RESPONSE_CACHE_TTL", 7 * 24 * 3600)),
+                max_bytes=int(os.getenv("RESPONSE_CACHE_MAX_BYTES", 50 * 1024 * 1024))
+            )
+        return _response_cache
 
 def get_text_response(env_path: str, messages: List[dict],
-                      model: str = "gpt-4o-mini", temperature: float = 0.5, n: int = 1) -> str:
+                      model: str = "gpt-4o-mini", temperature: float = 0.5, n: int = 1,
+                      use_cache: bool = True) -> str:
     """
     Get Text Response from OpenAI's ChatGPT response.
 
+    If use_cache is set, identical requests are answered from the response cache.
+    Rate limiting and retries are handled by the clients module.
+
+    Raises errors if any parameter is invalid.
+    """
+
+    if use_cache:
+        key = ResponseCache.key(model, temperature, n, messages)
+        cached = get_response_cache().get(key)
+        if cached is not None:
+            return cached
+
+    with metrics.span("llm", mode="blocking"):
+        result = clients.create_chat_completion(env_path, model=model, messages=messages, temperature=temperature, n=n)
+    metrics.record_usage(result.usage, model=model)
+    content = result.choices[0].message.content
+
+    if use_cache:
+        get_response_cache().set(key, content)
+    return content
+
+def get_text_response_stream(env_path: str, messages: List[dict],
+                             model: str = "gpt-4o-mini", temperature: float = 0.5,
+                             use_cache: bool = True) -> Iterator[str]:
+    """
+    Streaming variant of get_text_response, yielding the content deltas as they arrive.
+
+    Closing the generator early (e.g. when the user cancels) closes the underlying HTTP stream.
+    If use_cache is set, a cached response is yielded at once, and only fully received responses are cached.
+
     Raises errors if any parameter is invalid.
     """
 
-    openai.api_key = os.getenv(env_path, "")
-    result = openai.chat.completions.create(model=model, messages=messages, temperature=temperature, n=n)
-    return result.choices[0].message.content
+    if use_cache:
+        key = ResponseCache.key(model, temperature, 1, messages)
+        cached = get_response_cache().get(key)
+        if cached is not None:
+            yield cached
+            return
+
+    content = ""
+    started = time.perf_counter()
+    with clients.create_chat_completion(env_path, model=model, messages=messages, temperature=temperature,
+                                        stream=True, stream_options={"include_usage": True}) as stream:
+        for chunk in stream:
+            if chunk.usage is not None:
+                metrics.record_usage(chunk.usage, model=model)
+            if chunk.choices and chunk.choices[0].delta.content:
+                if not content:
+                    metrics.observe("llm_first_token", time.perf_counter() - started)
+                content += chunk.choices[0].delta.content
+                yield chunk.choices[0].delta.content
+    metrics.observe("llm", time.perf_counter() - started, mode="stream")
+
+    if use_cache:
+        get_response_cache().set(key, content)
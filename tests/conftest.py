@@ -0,0 +1,44 @@
+"""
+Fixtures shared by the tests.
+
+The fake_openai fixture serves the stub API of benchmarks/fake_openai.py and points the client layer at it, through
+OPENAI_API_KEY and OPENAI_BASE_URL. Clients are cached per API key variable and bind OPENAI_BASE_URL when they are
+created, so the fixture also empties that cache for the test: every test talks to its own server, whatever the tests
+before it created.
+
+Settings are read from the environment on first use, so the tests set the environment variables and reset the cached
+settings (e.g. metrics._settings) rather than reloading modules.
+"""
+from collections.abc import Callable
+from contextlib import ExitStack
+
+import logging
+
+import pytest
+
+from benchmarks.fake_openai import FakeOpenAI
+from src.metrics import metrics
+from src.utils import clients
+
+@pytest.fixture
+def fake_openai(monkeypatch) -> Callable[..., FakeOpenAI]:
+    """
+    Starts a FakeOpenAI with the given options, e.g. `server = fake_openai(latency=0, tokens=5)`.
+    """
+    with ExitStack() as stack:
+        def start(**options) -> FakeOpenAI:
+            server = stack.enter_context(FakeOpenAI(**options))
+            monkeypatch.setenv("OPENAI_API_KEY", "fake")
+            monkeypatch.setenv("OPENAI_BASE_URL", server.base_url)
+            monkeypatch.setattr(clients, "_clients", {})
+            monkeypatch.setattr(clients, "_async_clients", {})
+            return server
+        yield start
+
+@pytest.fixture
+def metrics_enabled(monkeypatch) -> None:
+    """
+    Records metrics for the test, to a logger without handlers, so that metrics.collect() sees them.
+    """
+    monkeypatch.setattr(metrics, "_settings", metrics.Settings(True, "unused.jsonl", 0, 0, None))
+    monkeypatch.setattr(metrics, "_logger", logging.getLogger("writer_agent.metrics.test"))
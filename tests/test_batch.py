@@ -0,0 +1,43 @@
+import pytest
+
+import batch
+from src.pipeline import pipeline
+
+JOB = {"id": "1", "theme": "RH", "title": "Título", "objective": "Objetivo"}
+
+def test_to_request_defaults_to_a_linkedin_post():
+    request = batch.to_request(JOB)
+
+    assert request.option == pipeline.LINKEDIN_POST
+    assert not request.long_form
+
+@pytest.mark.parametrize("job, message", [
+    ({**JOB, "title": ""}, "Missing required fields"),
+    ({**JOB, "option": "Bogus"}, "Unknown option: Bogus"),
+    ({**JOB, "option": pipeline.BOOK_SECTION, "long_form": True}, "positive integer length"),
+    ({**JOB, "option": pipeline.BOOK_SECTION, "long_form": True, "length": "3000"}, "positive integer length"),
+    ({**JOB, "persona": "Ninguém"}, "Unknown persona"),
+])
+def test_to_request_rejects_invalid_jobs(job, message):
+    with pytest.raises(ValueError, match=message):
+        batch.to_request(job)
+
+def test_run_job_reports_an_unreadable_attachment(tmp_path):
+    path = tmp_path / "foto.png"
+    path.write_bytes(b"not an image")
+
+    result = batch.run_job({**JOB, "attachments": [str(path)]}, registry=None, use_cache=False)
+
+    assert result["status"] == "error"
+    assert result["error"].startswith("AttachmentError") and "'foto.png'" in result["error"]
+
+def test_resumed_output_drops_a_line_cut_short_by_a_crash(tmp_path):
+    path = tmp_path / "results.jsonl"
+    path.write_text('{"id": "1", "status": "ok", "content": "a"}\n{"id": "2", "status": "o', encoding="utf-8")
+    assert batch.load_finished(str(path)) == {"1"}
+
+    with batch.open_output(str(path)) as output:
+        output.write('{"id": "2", "status": "ok", "content": "b"}\n')
+
+    assert batch.load_finished(str(path)) == {"1", "2"}
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 2
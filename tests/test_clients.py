@@ -0,0 +1,78 @@
+import time
+
+import openai
+import pytest
+
+from src.utils import clients
+
+ENV_PATH = "OPENAI_API_KEY"
+MESSAGES = [{"role": "user", "content": "Olá"}]
+
+@pytest.fixture
+def server(fake_openai, monkeypatch):
+    monkeypatch.setattr(clients, "BACKOFF_BASE", 0.01)
+    return fake_openai(latency=0, tokens=3)
+
+def test_rate_limiter_is_configured_on_first_use(monkeypatch):
+    monkeypatch.setattr(clients, "_rate_limiter", None)
+    monkeypatch.setenv("OPENAI_RATE_LIMIT", "2.5")
+    monkeypatch.setenv("OPENAI_RATE_LIMIT_BURST", "3")
+
+    limiter = clients.get_rate_limiter()
+
+    assert (limiter.rate, limiter.capacity) == (2.5, 3)
+    assert clients.get_rate_limiter() is limiter
+
+def test_server_errors_and_rate_limits_are_retried(server):
+    server.fail(503, count=2)
+    server.fail(429)
+
+    response = clients.create_chat_completion(ENV_PATH, model="gpt-4o-mini", messages=MESSAGES)
+
+    assert response.choices[0].message.content == " palavra0 palavra1 palavra2"
+    assert server.requests == 4
+
+def test_async_requests_are_retried(server):
+    server.fail(500, count=2)
+
+    response = clients.run_coroutine(clients.acreate_chat_completion(ENV_PATH, model="gpt-4o-mini", messages=MESSAGES)).result()
+
+    assert response.choices[0].message.content == " palavra0 palavra1 palavra2"
+    assert server.requests == 3
+
+def test_retries_give_up_after_the_configured_count(server, monkeypatch):
+    monkeypatch.setenv("OPENAI_MAX_RETRIES", "1")
+    server.fail(503, count=2)
+
+    with pytest.raises(openai.InternalServerError):
+        clients.create_chat_completion(ENV_PATH, model="gpt-4o-mini", messages=MESSAGES)
+    assert server.requests == 2
+
+@pytest.mark.parametrize("headers", [{"retry-after-ms": "400"}, {"retry-after": "0.4"}])
+def test_retry_after_is_honoured(server, headers):
+    server.fail(429, headers=headers)
+
+    started = time.perf_counter()
+    clients.create_chat_completion(ENV_PATH, model="gpt-4o-mini", messages=MESSAGES)
+
+    assert time.perf_counter() - started >= 0.4
+    assert server.requests == 2
+
+def test_retry_after_is_capped(server, monkeypatch):
+    monkeypatch.setattr(clients, "BACKOFF_MAX", 0.1)
+    server.fail(429, headers={"retry-after": "3600"})
+
+    started = time.perf_counter()
+    clients.create_chat_completion(ENV_PATH, model="gpt-4o-mini", messages=MESSAGES)
+
+    assert time.perf_counter() - started < 5
+    assert server.requests == 2
+
+@pytest.mark.parametrize("status, error", [(400, openai.BadRequestError), (401, openai.AuthenticationError),
+                                           (404, openai.NotFoundError)])
+def test_client_errors_are_not_retried(server, status, error):
+    server.fail(status, count=2)
+
+    with pytest.raises(error):
+        clients.create_chat_completion(ENV_PATH, model="gpt-4o-mini", messages=MESSAGES)
+    assert server.requests == 1
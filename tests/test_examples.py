@@ -0,0 +1,39 @@
+import glob
+import os
+
+import pytest
+
+from src.personas import examples
+
+@pytest.fixture
+def directory(tmp_path) -> str:
+    os.makedirs(tmp_path / "Monica" / "Prompts")
+    (tmp_path / "Monica" / "Prompts" / "posts.yaml").write_text(
+        "exemplos_de_posts:\n  - Cultura come estratégia no café da manhã.\n  - Contratar bem é o trabalho mais importante do líder.\n",
+        encoding="utf-8")
+    return str(tmp_path / "Monica")
+
+def test_index_is_cached_on_disk_and_reloaded(directory, tmp_path):
+    fingerprint = examples.ExampleIndex.fingerprint_of(directory)
+    built = examples.ExampleIndex(directory, fingerprint, str(tmp_path / "cache"))
+    [cache_path] = glob.glob(str(tmp_path / "cache" / "*"))
+
+    loaded = examples.ExampleIndex(directory, fingerprint, str(tmp_path / "cache"))
+
+    assert cache_path.endswith(".npz")
+    assert loaded.texts == built.texts
+    assert loaded.select("cultura", top_k=1) == built.select("cultura", top_k=1) == [(examples.POST, "Cultura come estratégia no café da manhã.")]
+
+@pytest.mark.parametrize("content", [b"", b"PK\x03\x04 truncated", b"not a zip file"])
+def test_an_unreadable_cache_file_is_rebuilt(directory, tmp_path, content):
+    fingerprint = examples.ExampleIndex.fingerprint_of(directory)
+    examples.ExampleIndex(directory, fingerprint, str(tmp_path / "cache"))
+    [cache_path] = glob.glob(str(tmp_path / "cache" / "*"))
+    with open(cache_path, "wb") as f:
+        f.write(content)
+
+    index = examples.ExampleIndex(directory, fingerprint, str(tmp_path / "cache"))
+
+    assert len(index.texts) == 2
+    assert examples.ExampleIndex(directory, fingerprint, str(tmp_path / "cache")).texts == index.texts  # rewritten
+    assert glob.glob(str(tmp_path / "cache" / "*")) == [cache_path]
@@ -0,0 +1,55 @@
+from collections import OrderedDict
+
+import base64
+import io
+
+import pytest
+from PIL import Image
+
+from benchmarks.fixtures import synthetic_image
+from src.images import images
+
+@pytest.fixture(autouse=True)
+def cache(monkeypatch):
+    monkeypatch.setattr(images, "_cache", OrderedDict())
+
+def decode(image: images.EncodedImage) -> bytes:
+    return base64.b64decode(image.data_url.split(",", 1)[1])
+
+def test_an_oversized_image_is_downscaled_to_the_max_edge(monkeypatch):
+    monkeypatch.setenv("IMAGE_MAX_EDGE", "800")
+
+    image = images.encode_image("foto.jpg", synthetic_image(2400, 1200, format="JPEG"))
+
+    assert image.data_url.startswith("data:image/jpeg;base64,")
+    assert Image.open(io.BytesIO(decode(image))).size == (800, 400)
+    assert image.encoded_size < image.original_size
+
+def test_a_transparent_png_stays_a_png():
+    pixels = Image.open(io.BytesIO(synthetic_image(2000, 1000))).convert("RGBA")
+    pixels.putalpha(128)
+    output = io.BytesIO()
+    pixels.save(output, format="PNG")
+
+    image = images.encode_image("logo.png", output.getvalue(), max_edge=500)
+
+    assert image.data_url.startswith("data:image/png;base64,")
+    with Image.open(io.BytesIO(decode(image))) as decoded:
+        assert (decoded.format, decoded.mode, decoded.size) == ("PNG", "RGBA", (500, 250))
+
+def test_a_small_compact_image_keeps_its_original_bytes():
+    output = io.BytesIO()
+    Image.open(io.BytesIO(synthetic_image(64, 48))).save(output, format="JPEG", quality=30, optimize=True)
+    data = output.getvalue()
+
+    image = images.encode_image("icone.jpg", data)
+
+    assert image.mime == "image/jpeg"
+    assert decode(image) == data
+
+def test_a_duplicate_upload_is_dropped():
+    data = synthetic_image(320, 240)
+
+    encoded = images.encode_images([("a.png", data), ("b.png", synthetic_image(320, 240, seed=1)), ("copia.png", data)])
+
+    assert [image.name for image in encoded] == ["a.png", "b.png"]
@@ -0,0 +1,102 @@
+from types import SimpleNamespace
+
+import asyncio
+import json
+import re
+import time
+
+import pytest
+
+from benchmarks.fake_openai import OUTLINE
+from src.longform import longform
+from src.metrics import metrics
+
+ENV_PATH = "OPENAI_API_KEY"
+MESSAGES = [{"role": "user", "content": [{"type": "text", "text": "Escreva uma seção."}]}]
+LATENCY = 0.2
+
+def test_subsection_metric_excludes_the_time_spent_by_the_reader(fake_openai, metrics_enabled):
+    fake_openai(latency=LATENCY, tokens=5)
+
+    with metrics.collect() as events:
+        for _ in longform.generate_long_form_stream(ENV_PATH, MESSAGES, 2400, use_cache=False):
+            time.sleep(2 * LATENCY)
+
+    seconds = [event["seconds"] for event in events if event["name"] == "longform_subsection"]
+    assert len(seconds) == len(OUTLINE["subsecoes"]) and all(elapsed < 2 * LATENCY for elapsed in seconds)
+
+class FakeSubsections:
+    """
+    Stands in for clients.acreate_chat_completion, answering each subsection with its position after delays[position].
+    """
+
+    def __init__(self, delays):
+        self.delays = delays
+        self.active = self.max_active = 0
+        self.finished, self.cancelled = [], []
+
+    async def __call__(self, env_path, messages, **kwargs):
+        position = int(re.search(r"subseção (\d+) de", messages[-1]["content"][0]["text"]).group(1))
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delays[position])
+        except asyncio.CancelledError:
+            self.cancelled.append(position)
+            raise
+        finally:
+            self.active -= 1
+        self.finished.append(position)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=f" Subseção {position} "))],
+                               usage=None)
+
+def outline(count: int) -> str:
+    return json.dumps({"subsecoes": [{"titulo": f"T{index}", "objetivo": "O", "palavras": 100}
+                                     for index in range(1, count + 1)]})
+
+@pytest.fixture
+def subsections(monkeypatch):
+    def install(delays):
+        fake = FakeSubsections(delays)
+        monkeypatch.setattr(longform.utils, "get_text_response", lambda *args, **kwargs: outline(len(delays) - 1))
+        monkeypatch.setattr(longform.clients, "acreate_chat_completion", fake)
+        return fake
+    return install
+
+def test_subsections_are_yielded_in_outline_order(subsections):
+    subsections([0, 0.3, 0.2, 0.1, 0])
+
+    parts = list(longform.generate_long_form_stream(ENV_PATH, MESSAGES, 3200))
+
+    assert "".join(parts) == "Subseção 1\n\nSubseção 2\n\nSubseção 3\n\nSubseção 4"
+
+def test_concurrency_is_bounded(subsections, monkeypatch):
+    monkeypatch.setenv("LONGFORM_MAX_CONCURRENCY", "2")
+    fake = subsections([0] + [0.05] * 6)
+
+    assert len(list(longform.generate_long_form_stream(ENV_PATH, MESSAGES, 4800))) == 6
+    assert fake.max_active == 2
+
+def test_closing_the_stream_cancels_the_pending_subsections(subsections):
+    fake = subsections([0, 0, 5, 5, 5])
+
+    stream = longform.generate_long_form_stream(ENV_PATH, MESSAGES, 3200)
+    assert next(stream) == "Subseção 1"
+    stream.close()
+
+    deadline = time.monotonic() + 2
+    while sorted(fake.cancelled) != [2, 3, 4] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert sorted(fake.cancelled) == [2, 3, 4]
+    assert fake.finished == [1]
+
+@pytest.mark.parametrize("text", ["Não sei.", '{"subsecoes": []}', '{"subsecoes": "T1"}', '{"subsecoes": ["T1", "T2"]}',
+                                  '[{"titulo": "T1"}]', '{"subsecoes": [{"titulo": "T1"}'])
+def test_a_malformed_outline_raises_value_error(text, monkeypatch):
+    monkeypatch.setattr(longform.utils, "get_text_response", lambda *args, **kwargs: text)
+
+    with pytest.raises(ValueError):
+        next(longform.generate_long_form_stream(ENV_PATH, MESSAGES, 3200))
+
+def test_the_outline_may_be_wrapped_in_a_code_fence():
+    assert longform._parse_outline(f"```json\n{outline(2)}\n```")[1]["titulo"] == "T2"
@@ -0,0 +1,42 @@
+import logging
+import socket
+
+from src.metrics import metrics
+
+def test_settings_are_read_on_first_use(monkeypatch):
+    monkeypatch.setattr(metrics, "_settings", None)
+    monkeypatch.setenv("METRICS_ENABLED", "1")
+    monkeypatch.setenv("METRICS_PORT", "9100")
+
+    assert metrics.enabled()
+    assert metrics.get_settings().port == "9100"
+
+def test_collect_records_the_events_of_the_block(metrics_enabled):
+    with metrics.collect() as events:
+        with metrics.span("stage", kind="test"):
+            pass
+        metrics.count("tokens", 3)
+
+    assert [(event["name"], event["type"]) for event in events] == [("stage", "span"), ("tokens", "counter")]
+
+def test_a_busy_port_only_disables_the_endpoint(tmp_path, monkeypatch, caplog):
+    path = tmp_path / "metrics.jsonl"
+    logger = logging.getLogger("writer_agent.metrics")
+    handlers = list(logger.handlers)
+    with socket.socket() as busy:
+        busy.bind(("127.0.0.1", 0))
+        busy.listen()
+        monkeypatch.setattr(metrics, "_settings", metrics.Settings(True, str(path), 1024 * 1024, 0, str(busy.getsockname()[1])))
+        monkeypatch.setattr(metrics, "_logger", None)
+        try:
+            for _ in range(3):
+                with metrics.span("stage"):
+                    pass
+            assert len(logger.handlers) == len(handlers) + 1
+        finally:
+            for handler in set(logger.handlers) - set(handlers):
+                logger.removeHandler(handler)
+                handler.close()
+
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 3
+    assert "Metrics endpoint disabled" in caplog.text
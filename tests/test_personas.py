@@ -0,0 +1,27 @@
+import pytest
+
+from src.personas import personas
+
+def write_persona(directory, name, order=None):
+    directory.mkdir()
+    order_line = f"ordem: {order}\n" if order is not None else ""
+    (directory / "persona.yaml").write_text(
+        f'nome: "{name}"\n{order_line}area: "A"\ncaracteristicas: "C"\nestilo_de_escrita: "E"\nestilo_de_fala: "F"\n',
+        encoding="utf-8")
+
+def test_personas_are_listed_by_order_then_directory(tmp_path):
+    write_persona(tmp_path / "a", "Sem ordem A")
+    write_persona(tmp_path / "b", "Segunda", order=2)
+    write_persona(tmp_path / "c", "Primeira", order=1)
+    write_persona(tmp_path / "d", "Sem ordem D")
+
+    store = personas.PersonaStore(str(tmp_path))
+
+    assert store.names() == ["Primeira", "Segunda", "Sem ordem A", "Sem ordem D"]
+    assert store.get("Segunda").directory == str(tmp_path / "b")
+    with pytest.raises(KeyError):
+        store.get("Ninguém")
+
+def test_repository_personas():
+    assert personas.persona_names() == ["Mônica Hauck", "Alessandro Vieira", "Persona Neutra"]
+    assert personas.get_persona("Mônica Hauck").block.startswith('"Mônica Hauck" é')
@@ -0,0 +1,54 @@
+import json
+import os
+
+import pytest
+
+from benchmarks.fixtures import synthetic_image, synthetic_pdf
+from src.pipeline import pipeline
+
+PERSONA = "Mônica Hauck"
+
+@pytest.fixture
+def prompt_paths(tmp_path, monkeypatch):
+    for env_var, path in (("LINKEDIN_SYSTEM_PROMPT_PATH", "LinkedIn/Monica/Prompts/system_prompt.txt"),
+                          ("LINKEDIN_USER_PROMPT_TEMPLATE_PATH", "LinkedIn/Monica/Prompts/user_prompt_template.txt")):
+        monkeypatch.setenv(env_var, os.path.join(pipeline.BASE_DIR, path))
+    monkeypatch.setenv("PERSONA_INDEX_CACHE_DIR", str(tmp_path / "personas"))
+
+def test_pdf_extension_is_case_insensitive():
+    assert pipeline.Attachment("Relatorio.PDF", b"").is_pdf
+    assert not pipeline.Attachment("foto.png", b"").is_pdf
+
+def test_prepare_reports_every_unreadable_attachment():
+    request = pipeline.ContentRequest(pipeline.LINKEDIN_POST, "RH", "Título", "Objetivo", attachments=[
+        pipeline.Attachment("Relatorio.PDF", b"not a pdf"),
+        pipeline.Attachment("foto.png", b"not an image"),
+        pipeline.Attachment("grafico.jpg", b"\xff\xd8\xff"),
+    ])
+
+    with pytest.raises(pipeline.AttachmentError) as exc_info:
+        pipeline.prepare(request, registry=None)
+
+    assert all(f"'{name}'" in str(exc_info.value) for name in ("Relatorio.PDF", "foto.png", "grafico.jpg"))
+
+def test_the_system_message_is_the_same_for_every_request_of_a_persona(prompt_paths):
+    registry = pipeline.create_prompt_registry()
+    first = pipeline.ContentRequest(pipeline.LINKEDIN_POST, "Liderança remota", "Times distribuídos", "Engajar gestores",
+                                    keywords="confiança", style=PERSONA)
+    second = pipeline.ContentRequest(pipeline.LINKEDIN_POST, "Cultura", "Feedback contínuo", "Inspirar líderes",
+                                     tone="Inspirador", style=PERSONA, attachments=[
+                                         pipeline.Attachment("dados.pdf", synthetic_pdf(2)),
+                                         pipeline.Attachment("foto.png", synthetic_image(64, 48))])
+
+    first_messages = pipeline.prepare(first, registry).messages
+    second_messages = pipeline.prepare(second, registry).messages
+
+    assert json.dumps(first_messages[0]) == json.dumps(second_messages[0])
+    system_text = json.dumps(first_messages[0], ensure_ascii=False)
+    for request, messages in ((first, first_messages), (second, second_messages)):
+        user_text = json.dumps(messages[1], ensure_ascii=False)
+        for value in (request.theme, request.title, request.objective):
+            assert value in user_text and value not in system_text
+        assert f"exemplos de posts de {PERSONA}" in user_text
+    assert f"exemplos de posts de {PERSONA}" not in system_text
+    assert [part["type"] for part in second_messages[1]["content"]][-1] == "image_url"
@@ -0,0 +1,39 @@
+import pytest
+
+from src.pipeline import pipeline
+from src.prompts import prompts
+
+FIELDS = frozenset({"theme", "title"})
+
+def test_system_prompts_may_contain_literal_braces(tmp_path):
+    (tmp_path / "system_prompt.txt").write_text('Responda em JSON: {"titulo": "..."}', encoding="utf-8")
+    (tmp_path / "user_prompt_template.txt").write_text("Tema: {theme}. Título: {title}.", encoding="utf-8")
+
+    registry = prompts.PromptRegistry([str(tmp_path)], FIELDS)
+
+    assert registry.get(str(tmp_path / "system_prompt.txt")).text.startswith("Responda em JSON")
+    assert registry.get_template(str(tmp_path / "user_prompt_template.txt")).format(theme="RH", title="T") == "Tema: RH. Título: T."
+
+def test_user_templates_must_match_the_supplied_fields(tmp_path):
+    (tmp_path / "user_prompt_template.txt").write_text("Tema: {theme}. Público: {audience}.", encoding="utf-8")
+    registry = prompts.PromptRegistry([str(tmp_path)], FIELDS)
+
+    with pytest.raises(prompts.PromptTemplateError, match=r"not supplied: \['audience'\].*does not use the supplied fields: \['title'\]"):
+        registry.get_template(str(tmp_path / "user_prompt_template.txt"))
+
+def test_an_invalid_file_only_fails_its_own_lookups(tmp_path):
+    (tmp_path / "broken.yaml").write_text("a: [", encoding="utf-8")
+    (tmp_path / "system_prompt.txt").write_text("Você é um escritor.", encoding="utf-8")
+
+    registry = prompts.PromptRegistry([str(tmp_path)], FIELDS)
+
+    assert registry.get(str(tmp_path / "system_prompt.txt")).text == "Você é um escritor."
+    with pytest.raises(prompts.PromptTemplateError, match="Invalid YAML"):
+        registry.get(str(tmp_path / "broken.yaml"))
+
+def test_a_prompt_variable_pointing_to_a_missing_file_is_reported(tmp_path, monkeypatch):
+    missing = str(tmp_path / "missing.txt")
+    monkeypatch.setenv("LINKEDIN_SYSTEM_PROMPT_PATH", missing)
+
+    with pytest.raises(prompts.PromptTemplateError, match=f"LINKEDIN_SYSTEM_PROMPT_PATH.*{missing}"):
+        pipeline.get_prompt(prompts.PromptRegistry([str(tmp_path)], FIELDS), "LINKEDIN_SYSTEM_PROMPT_PATH")
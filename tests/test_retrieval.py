@@ -0,0 +1,48 @@
+import pytest
+
+from src.retrieval import retrieval
+
+FILLER = " ".join(f"preenchimento{index % 50}" for index in range(1600))
+RELEVANT = " ".join(["A liderança remota exige comunicação assíncrona e confiança na equipe."] * 20)
+
+@pytest.mark.parametrize("count", [1, 39, 199, 200, 201, 450, 1000])
+def test_split_chunks_covers_every_word(count):
+    words = [f"w{index}" for index in range(count)]
+
+    chunks = retrieval.split_chunks(" ".join(words), words=200, overlap=40)
+
+    assert all(len(chunk.split()) <= 200 for chunk in chunks)
+    assert chunks[-1].split()[-1] == words[-1]
+    assert {word for chunk in chunks for word in chunk.split()} == set(words)
+
+def test_tokenize_drops_accents_case_and_short_words():
+    assert retrieval.tokenize("Comunicação é a CHAVE da equipe") == ["comunicacao", "chave", "equipe"]
+
+def test_text_within_budget_is_returned_unchanged():
+    assert retrieval.select_relevant(RELEVANT, "liderança", token_budget=10_000) == RELEVANT
+
+def test_the_relevant_chunk_ranks_above_filler():
+    text = FILLER + " " + RELEVANT + " " + FILLER
+
+    selected = retrieval.select_relevant(text, "liderança remota comunicação", token_budget=400, top_k=1)
+
+    assert "liderança remota" in selected
+    assert retrieval.estimate_tokens(selected) <= 400
+
+def test_budget_and_top_k_limit_the_selection():
+    text = " ".join(f"{RELEVANT} {FILLER[:3000]}" for _ in range(10))
+
+    by_top_k = retrieval.select_relevant(text, "liderança", token_budget=retrieval.estimate_tokens(text) - 1, top_k=2)
+    by_budget = retrieval.select_relevant(text, "liderança", token_budget=700, top_k=100)
+
+    assert by_top_k.count("[...]") == 1
+    chunks = by_budget.split("\n[...]\n")
+    assert len(chunks) > 1 and sum(retrieval.estimate_tokens(chunk) for chunk in chunks) <= 700
+
+def test_a_budget_smaller_than_a_chunk_keeps_the_start_of_the_best_one():
+    text = FILLER + " " + RELEVANT + " " + FILLER
+
+    selected = retrieval.select_relevant(text, "liderança remota", token_budget=50)
+
+    assert selected and retrieval.estimate_tokens(selected) <= 50
+    assert "liderança" in selected
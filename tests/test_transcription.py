@@ -0,0 +1,68 @@
+import json
+import os
+
+import pytest
+
+import transcription
+from benchmarks import segments as segments_benchmark
+from transcription import TranscriptionIntermediateRequest, TranscriptionService
+
+_speaker_segments = TranscriptionIntermediateRequest._TranscriptionIntermediateRequest__speaker_segments
+_map_segments = TranscriptionIntermediateRequest._TranscriptionIntermediateRequest__map_segments
+_transcript_by_segments = TranscriptionIntermediateRequest._TranscriptionIntermediateRequest__transcript_by_segments
+
+def test_process_reports_a_malformed_job_instead_of_raising(tmp_path):
+    service = TranscriptionService("hf-key", str(tmp_path))
+    job_path = os.path.join(tmp_path, "pending", "job.json")
+    with open(job_path, "w") as f:
+        f.write('{"filepath": "audio.mp')  # cut short while being written
+
+    result = service.process(None, job_path)
+
+    assert result["status"] == "error"
+    assert result["error"].startswith("JSONDecodeError")
+
+def test_pending_jobs_skips_jobs_removed_while_listing(tmp_path, monkeypatch):
+    service = TranscriptionService("hf-key", str(tmp_path))
+    for index, name in enumerate(("b.json", "a.json", "c.tmp")):
+        path = os.path.join(tmp_path, "pending", name)
+        with open(path, "w") as f:
+            json.dump({"filepath": name}, f)
+        os.utime(path, (index, index))
+    listdir = os.listdir
+    monkeypatch.setattr(transcription.os, "listdir", lambda path: listdir(path) + ["removed.json"])
+
+    assert [os.path.basename(path) for path in service.pending_jobs()] == ["b.json", "a.json"]
+
+def test_reconcile_speakers_never_maps_a_label_to_an_unlabeled_segment():
+    first = [{"start": 0.0, "end": 8.0, "speaker": "SPEAKER_00", "text": " a"},
+             {"start": 8.0, "end": 12.0, "speaker": None, "text": " b"}]
+    second = [{"start": 8.0, "end": 12.0, "speaker": "SPEAKER_01", "text": " b"},
+              {"start": 12.0, "end": 20.0, "speaker": "SPEAKER_01", "text": " c"},
+              {"start": 20.0, "end": 25.0, "speaker": "SPEAKER_00", "text": " d"}]
+
+    merged = transcription.reconcile_speakers([((0.0, 12.0, 0.0, 10.0), first), ((8.0, 25.0, 10.0, 25.0), second)])
+
+    # The unlabeled segment of the first window stays unlabeled, but lends its label to nobody
+    assert [segment["speaker"] for segment in merged] == ["SPEAKER_00", None, "SPEAKER_01", "SPEAKER_02"]
+
+@pytest.mark.parametrize("count", [0, 1, 2, 7, 100, 5000])
+def test_segment_helpers_match_the_reference_implementation(count):
+    segments = segments_benchmark.synthetic_segments(count, 8, seed=count)
+
+    pairs = _speaker_segments(segments)
+    expected_pairs = segments_benchmark.reference_speaker_segments(segments)
+    assert repr(pairs) == repr(expected_pairs)
+    assert repr(_map_segments(pairs)) == repr(segments_benchmark.reference_map_segments(expected_pairs))
+    assert _transcript_by_segments(segments) == segments_benchmark.reference_transcript_by_segments(segments)
+    assert _transcript_by_segments(transcription.SegmentArrays(segments)) == segments_benchmark.reference_transcript_by_segments(segments)
+
+def test_transcript_matches_the_reference_implementation_with_unlabeled_segments():
+    segments = segments_benchmark.synthetic_segments(200, 4, seed=1)
+    for index in (0, 1, 50, 51, 120, 199):
+        segments[index]["speaker"] = None
+
+    expected = segments_benchmark.reference_transcript_by_segments(segments)
+    assert "*None:*" in expected
+    assert _transcript_by_segments(segments) == expected
+    assert TranscriptionIntermediateRequest.from_segments(segments)[0] == expected
@@ -0,0 +1,46 @@
+import time
+
+import pytest
+
+from src.utils import utils
+
+ENV_PATH = "OPENAI_API_KEY"
+MESSAGES = [{"role": "user", "content": [{"type": "text", "text": "Escreva um post."}]}]
+TOKENS = 20
+
+@pytest.fixture
+def server(fake_openai):
+    return fake_openai(latency=0, token_delay=0.02, tokens=TOKENS)
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch) -> utils.ResponseCache:
+    cache = utils.ResponseCache(str(tmp_path / "responses.sqlite3"))
+    monkeypatch.setattr(utils, "_response_cache", cache)
+    return cache
+
+def test_stream_yields_the_replayed_deltas(server, cache):
+    deltas = list(utils.get_text_response_stream(ENV_PATH, MESSAGES))
+
+    # The server ends with the include_usage chunk, whose choices are empty: it must not yield anything
+    assert server.last_request["stream_options"] == {"include_usage": True}
+    assert deltas == [f" palavra{index}" for index in range(TOKENS)]
+    assert cache.get(utils.ResponseCache.key("gpt-4o-mini", 0.5, 1, MESSAGES)) == "".join(deltas)
+
+def test_stream_is_answered_from_the_cache(server, cache):
+    cache.set(utils.ResponseCache.key("gpt-4o-mini", 0.5, 1, MESSAGES), "em cache")
+    requests = server.requests
+
+    assert list(utils.get_text_response_stream(ENV_PATH, MESSAGES)) == ["em cache"]
+    assert server.requests == requests
+
+def test_closing_the_stream_early_closes_the_connection_and_caches_nothing(server, cache):
+    aborted = server.aborted
+    stream = utils.get_text_response_stream(ENV_PATH, MESSAGES)
+    assert [next(stream), next(stream)] == [" palavra0", " palavra1"]
+    stream.close()
+
+    deadline = time.monotonic() + 5
+    while server.aborted == aborted and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert server.aborted == aborted + 1
+    assert cache.get(utils.ResponseCache.key("gpt-4o-mini", 0.5, 1, MESSAGES)) is None
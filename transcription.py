@@ -1,15 +1,24 @@
-import whisperx
 import pydantic
+import numpy as np
 
+from concurrent.futures import ProcessPoolExecutor
 from dotenv import load_dotenv
+from typing import Dict, List, Optional, Tuple
+import argparse
+import glob
+import json
+import multiprocessing
+import subprocess
+import threading
+import time
 import uuid
 
 import sys
 import os
 
-load_dotenv()
+from src.metrics import metrics
 
-filepath = sys.argv[1]
+load_dotenv()
 
 WHISPERX_MODEL = "large-v2"
 DEVICE = "cpu"
@@ -17,6 +26,77 @@ COMPUTE_TYPE = "int8"
 BATCH_SIZE = 16
 LANGUAGE = "pt"
 
+QUEUE_DIR = "transcription_queue"
+POLL_INTERVAL = 2.0
+RESULTS_DIR = "transcription_results"
+
+SAMPLE_RATE = 16000
+# Long recordings are split into windows of about WINDOW_SECONDS, cut at the quietest point of the last
+# CUT_SEARCH_SECONDS, each window extending OVERLAP_SECONDS past its cuts to reconcile speakers
+WINDOW_SECONDS = 600
+OVERLAP_SECONDS = 30
+CUT_SEARCH_SECONDS = 10
+THREADS_PER_WORKER = 4
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".m4a", ".ogg", ".flac", ".mp4", ".mov", ".mkv", ".webm")
+
+class TranscriptionModels:
+    """
+    The WhisperX transcription model, the alignment model and the pyannote diarization pipeline, loaded once
+    to be reused across many audio files.
+
+    Attributes:
+        hf_key (str): The Hugging Face API key used by the diarization pipeline.
+    """
+
+    def __init__(self, hf_key: str):
+        import whisperx
+
+        self.model = whisperx.load_model(WHISPERX_MODEL, DEVICE, compute_type=COMPUTE_TYPE, language=LANGUAGE)
+        self.align_model, self.align_metadata = whisperx.load_align_model(language_code=LANGUAGE, device=DEVICE)
+        self.diarize_model = whisperx.DiarizationPipeline(use_auth_token=hf_key, device=DEVICE)
+
+class SegmentArrays:
+    """
+    A columnar view of diarized dialogue segments, on which the segment helpers run in linear time.
+
+    Start and end times are kept both as float64 arrays, for vectorized computations, and as the original values,
+    so that the intervals returned are exactly the ones of the segments.
+
+    Attributes:
+        starts (np.ndarray): The start times in seconds.
+        ends (np.ndarray): The end times in seconds.
+        speaker_ids (np.ndarray): The index in speakers of the speaker of each segment.
+        speakers (list): The speaker names, in order of first appearance.
+        texts (list): The texts of the segments.
+        speaker_values (list): The speaker of each segment.
+        start_values (list): The original start times.
+        end_values (list): The original end times.
+    """
+
+    __slots__ = ("starts", "ends", "speaker_ids", "speakers", "texts", "speaker_values", "start_values", "end_values")
+
+    def __init__(self, segments: List[dict]):
+        self.start_values = [segment["start"] for segment in segments]
+        self.end_values = [segment["end"] for segment in segments]
+        self.texts = [segment["text"] for segment in segments]
+        self.speaker_values = [segment["speaker"] for segment in segments]
+        self.starts = np.array(self.start_values, dtype=np.float64)
+        self.ends = np.array(self.end_values, dtype=np.float64)
+
+        ids = {}
+        self.speaker_ids = np.array([ids.setdefault(speaker, len(ids)) for speaker in self.speaker_values], dtype=np.int64)
+        self.speakers = list(ids)
+
+    @staticmethod
+    def of(segments) -> "SegmentArrays":
+        """
+        Returns segments as SegmentArrays, converting a list of segment dictionaries.
+        """
+        return segments if isinstance(segments, SegmentArrays) else SegmentArrays(segments)
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
 class TranscriptionIntermediateRequest(pydantic.BaseModel):
     """
     A class to represent an intermediate transcription request. Includes diarization and speaker identification assigning ID's.
@@ -37,7 +117,7 @@ class TranscriptionIntermediateRequest(pydantic.BaseModel):
         This function takes a list of dialogue segments and formats them into a transcript, preserving speaker turns and segment breaks.
 
         Args:
-            segments (list): A list of dictionaries representing dialogue segments. 
+            segments (list | SegmentArrays): A list of dictionaries representing dialogue segments, or their SegmentArrays.
                             Each dictionary should have the following keys:
                             - 'speaker' (str): The name of the speaker for the segment.
                             - 'text' (str): The text spoken in the segment.
@@ -45,21 +125,23 @@ class TranscriptionIntermediateRequest(pydantic.BaseModel):
         Returns:
             str: The formatted transcript text.
         """
-        transcript = ""
+        if isinstance(segments, SegmentArrays):
+            speakers, texts = segments.speaker_values, segments.texts
+        else:
+            speakers, texts = [segment["speaker"] for segment in segments], [segment["text"] for segment in segments]
+
+        # a new line per speaker turn; a segment without speaker restarts the transcript as if it were the first one
+        parts = []
         last_speaker = None
-        
-        for segment in segments:
+        for speaker, text in zip(speakers, texts):
             if last_speaker is None:
-                transcript += f"*{segment['speaker']}:* \"{segment['text'].strip()}"
-            elif last_speaker != segment['speaker']:
-                transcript += f"\"\n*{segment['speaker']}:* \"{segment['text'].strip()}"
+                parts.append(f"*{speaker}:* \"{text.strip()}")
+            elif last_speaker != speaker:
+                parts.append(f"\"\n*{speaker}:* \"{text.strip()}")
             else:
-                transcript += f" {segment['text'].strip()}"
-            last_speaker = segment['speaker']
-        
-        transcript += "\"\n"
-
-        return transcript
+                parts.append(f" {text.strip()}")
+            last_speaker = speaker
+        return "".join(parts) + "\"\n"
 
     
     @staticmethod
@@ -67,8 +149,10 @@ class TranscriptionIntermediateRequest(pydantic.BaseModel):
         """
         This function takes a list of dialogue segments and identifies the speaker segments based on the speaker turns.
 
+        Runs in linear time on the columnar SegmentArrays of the segments.
+
         Args:
-            segments (list): A list of dictionaries representing dialogue segments. 
+            segments (list | SegmentArrays): A list of dictionaries representing dialogue segments, or their SegmentArrays.
                             Each dictionary should have the following keys:
                             - 'speaker' (str): The name of the speaker for the segment.
                             - 'text' (str): The text spoken in the segment.
@@ -85,63 +169,63 @@ class TranscriptionIntermediateRequest(pydantic.BaseModel):
         _IDEAL_DURATION = 10
         _MAX_DURATION = 15
 
-        unique_speakers = set([segment['speaker'] for segment in segments])
+        segments = SegmentArrays.of(segments)
+        durations = segments.ends - segments.starts
+        positions = np.arange(len(durations))
+
+        # first segment of each speaker lasting at least _MIN_DURATION, in the order they appear
+        long_enough = np.flatnonzero(durations >= _MIN_DURATION)
+        first = np.full(len(segments.speakers), len(durations))
+        np.minimum.at(first, segments.speaker_ids[long_enough], long_enough)
+
+        if verbose:
+            for index in np.flatnonzero((durations < _MIN_DURATION) & (positions < first[segments.speaker_ids])).tolist():
+                print(f"Segment too short: {segments.texts[index]}")  # print the segment text if it's too short
 
         pairs = {}
-        for segment in segments:
-            start = segment['start']
-            end = segment['end']
-
-            if segment['speaker'] not in pairs:
-                if end - start < _MIN_DURATION:
-                    if verbose:
-                        print(f"Segment too short: {segment['text']}")  # print the segment text if it's too short
-                    continue
-                elif end - start < _IDEAL_DURATION:
-                    interval = (start, end)
-                elif end - start > _MAX_DURATION:
-                    interval = (start, start + _MAX_DURATION)
-                else:
-                    interval = (start, start + _IDEAL_DURATION)
-                pairs[segment['speaker']] = interval
-
-        if len(pairs) != len(unique_speakers):
+        for index in np.sort(first[first < len(durations)]).tolist():
+            start = segments.start_values[index]
+            end = segments.end_values[index]
+            duration = durations[index]
+            if duration < _IDEAL_DURATION:
+                interval = (start, end)
+            elif duration > _MAX_DURATION:
+                interval = (start, start + _MAX_DURATION)
+            else:
+                interval = (start, start + _IDEAL_DURATION)
+            pairs[segments.speakers[segments.speaker_ids[index]]] = interval
+
+        if len(pairs) != len(segments.speakers):
             if verbose:
                 print("Warning: Some speakers were not identified. Combining segments...")
-            combined_segments = {}
-            for segment in segments:
-                if segment['speaker'] not in combined_segments:
-                    combined_segments[segment['speaker']] = []
-                combined_segments[segment['speaker']].append((segment['start'], segment['end']))
+            # segment indices of each speaker, in order, as slices of a stable sort by speaker
+            order = np.argsort(segments.speaker_ids, kind="stable")
+            bounds = np.searchsorted(segments.speaker_ids[order], np.arange(len(segments.speakers) + 1))
 
-            for speaker in combined_segments:
+            for speaker_id, speaker in enumerate(segments.speakers):
                 if speaker not in pairs:
-                    # sum the total duration of all segments for the speaker
-                    total_duration = sum([end - start for start, end in combined_segments[speaker]])
-                    if total_duration < _MIN_DURATION:
+                    indices = order[bounds[speaker_id]:bounds[speaker_id + 1]]
+                    # running total duration of the speaker segments, summed left to right
+                    totals = np.cumsum(durations[indices])
+                    if totals[-1] < _MIN_DURATION:
                         if verbose:
                             print(f"Total duration too short for speaker {speaker}. Defining as None and skipping.")
                         pairs[speaker] = None
                     else:
-                        # get all necessary segments for a total duration of at most 5 seconds
-                        intervals = []
-                        for start, end in combined_segments[speaker]:
-                            if sum([e - s for s, e in intervals]) >= _IDEAL_DURATION:
-                                break
-                            else:
-                                intervals.append((start, end))
-                        pairs[speaker] = intervals
+                        # take segments until their total duration reaches _IDEAL_DURATION
+                        reached = totals >= _IDEAL_DURATION
+                        count = int(np.argmax(reached)) + 1 if reached.any() else len(indices)
+                        pairs[speaker] = [(segments.start_values[index], segments.end_values[index]) for index in indices[:count].tolist()]
             
             # check if there are still speakers that were not identified and are None
-            for speaker in pairs:
-                if pairs[speaker] is None:
-                    if verbose:
+            if verbose:
+                for speaker in pairs:
+                    if pairs[speaker] is None:
                         print(f"Speaker {speaker} was not identified.")
-                elif type(pairs[speaker]) == list:
-                    if verbose:
+                    elif type(pairs[speaker]) == list:
                         print(f"Speaker {speaker} was identified with multiple segments.")
-                elif verbose:
-                    print(f"Speaker {speaker} was identified with a single segment.")
+                    else:
+                        print(f"Speaker {speaker} was identified with a single segment.")
         
         if verbose:
             for speaker in pairs:
@@ -163,22 +247,40 @@ class TranscriptionIntermediateRequest(pydantic.BaseModel):
             dict: A dictionary mapping speaker names to segment intervals. The segment intervals are in miliseconds.
         """
         mapped_segments = {}
-        for pair in pairs:
-            if pair not in mapped_segments:
-                mapped_intervals = None
-                if pairs[pair] is not None and type(pairs[pair]) == list:
-                    mapped_intervals = [(start * 1000, end * 1000) for start, end in pairs[pair]]
-                elif pairs[pair] is not None:
-                    mapped_intervals = [(pairs[pair][0] * 1000, pairs[pair][1] * 1000)]
-                mapped_segments[pair] = mapped_intervals
+        for pair, intervals in pairs.items():
+            if intervals is None:
+                mapped_segments[pair] = None
+            elif type(intervals) == list:
+                mapped_segments[pair] = [(start * 1000, end * 1000) for start, end in intervals]
+            else:
+                mapped_segments[pair] = [(intervals[0] * 1000, intervals[1] * 1000)]
         return mapped_segments
 
-    def get_intermediate_transcription(self) -> str:
+    @staticmethod
+    def from_segments(segments) -> Tuple[str, dict]:
+        """
+        Builds the transcript and the speaker segments (in miliseconds) of a list of diarized dialogue segments.
+        """
+        segments = SegmentArrays.of(segments)
+        pairs = TranscriptionIntermediateRequest.__map_segments(
+                    TranscriptionIntermediateRequest.__speaker_segments(
+                        segments))
+    
+        transcript = TranscriptionIntermediateRequest.__transcript_by_segments(segments)
+
+        return transcript, pairs
+
+    def get_intermediate_transcription(self, models: Optional[TranscriptionModels] = None, timings: Optional[dict] = None) -> str:
         """
         Transcribes and diarizes an audio file, returning dialogue segments and speaker turns for the user to identify.
         Passing the speaker turns to the user is a way to help the user identify the speakers in the audio file.
         After the user identifies the speakers, their names can be set in the speaker segments.
 
+        Args:
+            models (TranscriptionModels, optional): Already loaded models. If not given, the models are loaded for this call.
+            timings (dict, optional): If given, filled with the duration in seconds of the "transcribe", "align",
+                "diarize" and "assign" stages.
+
         Returns:
             tuple: A tuple containing the transcript (str) and the speaker segments (dict[id, segments]).
         
@@ -187,37 +289,364 @@ class TranscriptionIntermediateRequest(pydantic.BaseModel):
             ValueError: If the model is invalid or the API key is missing.
             Exception: If an error occurs during transcription or diarization.
         """
+        import whisperx
 
-        model = whisperx.load_model(WHISPERX_MODEL, DEVICE, compute_type=COMPUTE_TYPE, language=LANGUAGE)
+        if models is None:
+            models = TranscriptionModels(self.hf_key.get_secret_value())
+        if timings is None:
+            timings = {}
 
+        started = time.perf_counter()
         audio = whisperx.load_audio(self.filepath)
-        result = model.transcribe(audio, batch_size=BATCH_SIZE, language=LANGUAGE)
-        
-        model_a, metadata = whisperx.load_align_model(language_code=LANGUAGE, device=DEVICE)
-        result = whisperx.align(result["segments"], model_a, metadata, audio, DEVICE, return_char_alignments=False)
-        
-        diarize_model = whisperx.DiarizationPipeline(use_auth_token=self.hf_key.get_secret_value(), device=DEVICE)
-        diarize_segments = diarize_model(audio)
+        result = models.model.transcribe(audio, batch_size=BATCH_SIZE, language=LANGUAGE)
+        timings["transcribe"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        result = whisperx.align(result["segments"], models.align_model, models.align_metadata, audio, DEVICE, return_char_alignments=False)
+        timings["align"] = time.perf_counter() - started
 
+        started = time.perf_counter()
+        diarize_segments = models.diarize_model(audio)
+        timings["diarize"] = time.perf_counter() - started
+
+        started = time.perf_counter()
         result = whisperx.assign_word_speakers(diarize_segments, result)
-    
-        pairs = TranscriptionIntermediateRequest.__map_segments(
-                    TranscriptionIntermediateRequest.__speaker_segments(
-                        result["segments"]))
-    
-        transcript = TranscriptionIntermediateRequest.__transcript_by_segments(result["segments"])
+        transcript, pairs = TranscriptionIntermediateRequest.from_segments(result["segments"])
+        timings["assign"] = time.perf_counter() - started
+        for stage in ("transcribe", "align", "diarize", "assign"):
+            metrics.observe("transcription", timings[stage], stage=stage)
     
         word_level_diarization = result
 
         return transcript, pairs, word_level_diarization
 
-hf_key = os.getenv("HF_KEY")
+def output_directory(persona: Optional[str]) -> str:
+    """
+    Returns the directory transcriptions are written to: LinkedIn/<persona>/Transcriptions if a persona is given,
+    RESULTS_DIR otherwise.
+
+    Raises:
+        ValueError: If there is no LinkedIn/<persona> directory.
+    """
+    if persona is None:
+        return RESULTS_DIR
+    if not os.path.isdir(os.path.join("LinkedIn", persona)):
+        raise ValueError(f"Unknown persona directory: LinkedIn/{persona}")
+    return os.path.join("LinkedIn", persona, "Transcriptions")
+
+def write_transcript(transcript: str, persona: Optional[str] = None) -> str:
+    """
+    Writes a transcript to a new file in the output directory of persona, returning its path.
+    """
+    directory = output_directory(persona)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{uuid.uuid4()}.txt")
+    with open(path, "w") as f:
+        f.write(transcript)
+    return path
+
+def audio_duration(filepath: str) -> float:
+    """
+    Returns the duration of an audio or video file in seconds, using ffprobe.
+    """
+    output = subprocess.run(["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "default=noprint_wrappers=1:nokey=1", filepath],
+                            capture_output=True, check=True, text=True).stdout
+    return float(output.strip())
+
+def load_audio_window(filepath: str, start: float, end: float) -> np.ndarray:
+    """
+    Decodes only [start, end) seconds of a file to mono 16 kHz float32 samples, like whisperx.load_audio does
+    for a whole file.
+    """
+    output = subprocess.run(["ffmpeg", "-nostdin", "-v", "error", "-ss", str(start), "-t", str(end - start), "-i", filepath,
+                             "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE), "-"],
+                            capture_output=True, check=True).stdout
+    return np.frombuffer(output, np.int16).flatten().astype(np.float32) / 32768.0
+
+def quietest_point(filepath: str, start: float, end: float, frame_seconds: float = 0.5) -> float:
+    """
+    Returns the center, in seconds, of the frame of [start, end) with the lowest energy: an energy based voice
+    activity boundary, where cutting the audio is least likely to split a word.
+    """
+    audio = load_audio_window(filepath, start, end)
+    frame = int(frame_seconds * SAMPLE_RATE)
+    if len(audio) < frame:
+        return end
+    frames = audio[:len(audio) // frame * frame].reshape(-1, frame)
+    return float(start + (np.argmin((frames ** 2).mean(axis=1)) + 0.5) * frame_seconds)
+
+def split_windows(filepath: str, duration: float) -> List[Tuple[float, float, float, float]]:
+    """
+    Splits a recording into windows of about WINDOW_SECONDS cut at quiet points.
+
+    Returns:
+        list: Tuples (start, end, cut_start, cut_end): a window decodes [start, end), and owns the segments
+        starting in [cut_start, cut_end). Consecutive windows overlap by OVERLAP_SECONDS around each cut.
+    """
+    cuts = [0.0]
+    while duration - cuts[-1] > WINDOW_SECONDS + OVERLAP_SECONDS:
+        nominal = cuts[-1] + WINDOW_SECONDS
+        cuts.append(quietest_point(filepath, nominal - CUT_SEARCH_SECONDS, nominal))
+    cuts.append(duration)
+    return [(max(cut_start - OVERLAP_SECONDS, 0.0), min(cut_end + OVERLAP_SECONDS, duration), cut_start, cut_end)
+            for cut_start, cut_end in zip(cuts, cuts[1:])]
+
+_worker_models: Optional[TranscriptionModels] = None
+
+def _init_worker(threads: int) -> None:
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    import torch
+    torch.set_num_threads(threads)
+
+def _transcribe_window(filepath: str, start: float, end: float, hf_key: str) -> List[dict]:
+    """
+    Transcribes, aligns and diarizes [start, end) seconds of a file in a worker process, which loads the models on
+    its first window. Returns the segments with times relative to the whole file.
+    """
+    import whisperx
+
+    global _worker_models
+    if _worker_models is None:
+        _worker_models = TranscriptionModels(hf_key)
+
+    audio = load_audio_window(filepath, start, end)
+    result = _worker_models.model.transcribe(audio, batch_size=BATCH_SIZE, language=LANGUAGE)
+    result = whisperx.align(result["segments"], _worker_models.align_model, _worker_models.align_metadata, audio, DEVICE, return_char_alignments=False)
+    result = whisperx.assign_word_speakers(_worker_models.diarize_model(audio), result)
+    return [{"start": segment["start"] + start, "end": segment["end"] + start, "text": segment["text"], "speaker": segment.get("speaker")}
+            for segment in result["segments"]]
+
+def reconcile_speakers(windows: List[Tuple[Tuple[float, float, float, float], List[dict]]]) -> List[dict]:
+    """
+    Merges the segments of consecutive windows of a recording into one list with consistent speaker labels.
+
+    Each window keeps the segments starting in its own [cut_start, cut_end) range. The local labels of a window are
+    matched to the labels already given to the previous window by how long they speak at the same time in the
+    overlap around their shared cut; unmatched labels become new speakers.
+
+    Args:
+        windows (list): (window, segments) pairs in order, as returned by split_windows and _transcribe_window.
+
+    Returns:
+        list: The merged segments, labeled SPEAKER_00, SPEAKER_01, ...
+    """
+    merged = []
+    previous = []
+    speakers = 0
+    for (start, _, cut_start, cut_end), segments in windows:
+        previous = [segment for segment in previous if segment["end"] > start]
+        overlap = {}
+        for segment in segments:
+            for other in previous:
+                shared = min(segment["end"], other["end"]) - max(segment["start"], other["start"])
+                if shared > 0 and segment["speaker"] is not None and other["speaker"] is not None:
+                    key = (segment["speaker"], other["speaker"])
+                    overlap[key] = overlap.get(key, 0.0) + shared
+
+        mapping: Dict[str, str] = {}
+        for (local, speaker), _ in sorted(overlap.items(), key=lambda item: -item[1]):
+            if local not in mapping and speaker not in mapping.values():
+                mapping[local] = speaker
+        for segment in segments:
+            if segment["speaker"] is not None and segment["speaker"] not in mapping:
+                mapping[segment["speaker"]] = f"SPEAKER_{speakers:02d}"
+                speakers += 1
 
-print("get_intermediate_transcription:")
+        previous = [{**segment, "speaker": mapping.get(segment["speaker"])} for segment in segments]
+        merged += [segment for segment in previous if cut_start <= segment["start"] < cut_end]
+    return merged
 
-transcript, _, _ = TranscriptionIntermediateRequest(filepath=filepath, hf_key=hf_key).get_intermediate_transcription()
+def transcribe_batch(pattern: str, hf_key: str, persona: Optional[str] = None, workers: Optional[int] = None,
+                     threads: int = THREADS_PER_WORKER) -> Dict[str, str]:
+    """
+    Transcribes every audio or video file of a directory or glob pattern.
+
+    Long recordings are split into overlapping windows (see split_windows). Windows of all files are spread across
+    a process pool of workers processes, each using threads threads and holding a single window in memory, so peak
+    memory does not depend on the recording length.
+
+    Args:
+        pattern (str): A directory, or a glob pattern of files.
+        hf_key (str): The Hugging Face API key used by the diarization pipeline.
+        persona (str, optional): Write the transcripts to LinkedIn/<persona>/Transcriptions.
+        workers (int, optional): Number of worker processes. Defaults to the number of cores divided by threads.
+
+    Returns:
+        dict: The path of the transcript written for each file.
+    """
+    if os.path.isdir(pattern):
+        filepaths = sorted(os.path.join(pattern, name) for name in os.listdir(pattern) if name.lower().endswith(AUDIO_EXTENSIONS))
+    else:
+        filepaths = sorted(glob.glob(pattern, recursive=True))
+    workers = workers or max(1, (os.cpu_count() or 1) // threads)
+
+    outputs = {}
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_worker, initargs=(threads,)) as executor:
+        jobs = []
+        for filepath in filepaths:
+            windows = split_windows(filepath, audio_duration(filepath))
+            jobs.append((filepath, [(window, executor.submit(_transcribe_window, filepath, window[0], window[1], hf_key)) for window in windows]))
+
+        for filepath, futures in jobs:
+            segments = reconcile_speakers([(window, future.result()) for window, future in futures])
+            transcript, _ = TranscriptionIntermediateRequest.from_segments(segments)
+            outputs[filepath] = write_transcript(transcript, persona)
+            print(f"{filepath}: {len(futures)} window(s), {len(segments)} segment(s) -> {outputs[filepath]}")
+    return outputs
+
+class TranscriptionService:
+    """
+    A long-lived transcription worker: loads the models once, then processes the jobs of a local directory queue.
 
-print(transcript)
+    A job is a JSON file {"filepath": ..., "persona": ...} in <queue_dir>/pending. Its result, with the transcript path
+    and the per-stage timings, is written with the same name to <queue_dir>/done. The service touches
+    <queue_dir>/heartbeat every POLL_INTERVAL seconds, so clients can tell whether it is running.
+
+    Attributes:
+        queue_dir (str): The queue directory.
+        hf_key (str): The Hugging Face API key used by the diarization pipeline.
+    """
+
+    def __init__(self, hf_key: str, queue_dir: str = QUEUE_DIR):
+        self.hf_key = hf_key
+        self.queue_dir = queue_dir
+        for name in ("pending", "done"):
+            os.makedirs(os.path.join(queue_dir, name), exist_ok=True)
+
+    @staticmethod
+    def is_running(queue_dir: str = QUEUE_DIR) -> bool:
+        heartbeat = os.path.join(queue_dir, "heartbeat")
+        return os.path.exists(heartbeat) and time.time() - os.path.getmtime(heartbeat) < 5 * POLL_INTERVAL
+
+    @staticmethod
+    def submit(filepath: str, persona: Optional[str] = None, queue_dir: str = QUEUE_DIR) -> str:
+        """
+        Enqueues an audio file, returning the job id.
 
-with open(f"transcription_results/{uuid.uuid4()}.txt", "w") as f:
-    f.write(transcript)
\ No newline at end of file
+        Raises:
+            ValueError: If there is no LinkedIn/<persona> directory.
+        """
+        output_directory(persona)
+        job_id = str(uuid.uuid4())
+        job = {"filepath": os.path.abspath(filepath), "persona": persona}
+        temporary = os.path.join(queue_dir, "pending", f"{job_id}.tmp")
+        with open(temporary, "w") as f:
+            json.dump(job, f)
+        os.replace(temporary, os.path.join(queue_dir, "pending", f"{job_id}.json"))
+        return job_id
+
+    @staticmethod
+    def wait(job_id: str, queue_dir: str = QUEUE_DIR) -> dict:
+        """
+        Blocks until the job is done, returning its result.
+
+        Raises:
+            RuntimeError: If the service stops before the job is done.
+        """
+        path = os.path.join(queue_dir, "done", f"{job_id}.json")
+        while not os.path.exists(path):
+            if not TranscriptionService.is_running(queue_dir):
+                raise RuntimeError("The transcription service stopped before finishing the job.")
+            time.sleep(POLL_INTERVAL / 4)
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def __heartbeat(self) -> None:
+        while True:
+            with open(os.path.join(self.queue_dir, "heartbeat"), "w") as f:
+                f.write(str(os.getpid()))
+            time.sleep(POLL_INTERVAL)
+
+    def pending_jobs(self) -> List[str]:
+        """
+        The paths of the pending jobs, oldest first. Jobs removed while listing are skipped.
+        """
+        pending = os.path.join(self.queue_dir, "pending")
+        jobs = []
+        for name in os.listdir(pending):
+            if name.endswith(".json"):
+                try:
+                    jobs.append((os.path.getmtime(os.path.join(pending, name)), os.path.join(pending, name)))
+                except FileNotFoundError:
+                    pass
+        return [path for _, path in sorted(jobs)]
+
+    def process(self, models: TranscriptionModels, job_path: str) -> dict:
+        """
+        Runs a job, returning its result. Never raises: a failure, including an unreadable job file, is reported
+        in the result.
+        """
+        timings = {}
+        started = time.perf_counter()
+        try:
+            with open(job_path, "r") as f:
+                job = json.load(f)
+            transcript, _, _ = TranscriptionIntermediateRequest(filepath=job["filepath"], hf_key=self.hf_key).get_intermediate_transcription(models, timings)
+            result = {"status": "ok", "output": os.path.abspath(write_transcript(transcript, job.get("persona")))}
+        except Exception as e:
+            result = {"status": "error", "error": f"{type(e).__name__}: {e}"}
+        result["timings"] = {**timings, "total": time.perf_counter() - started}
+        return result
+
+    def serve(self) -> None:
+        """
+        Loads the models and processes the queue until interrupted.
+        """
+        started = time.perf_counter()
+        models = TranscriptionModels(self.hf_key)
+        print(f"Models loaded in {time.perf_counter() - started:.1f}s. Watching {self.queue_dir}/pending")
+        threading.Thread(target=self.__heartbeat, daemon=True).start()
+
+        while True:
+            jobs = self.pending_jobs()
+            if not jobs:
+                time.sleep(POLL_INTERVAL)
+            for job_path in jobs:
+                result = self.process(models, job_path)
+                done = os.path.join(self.queue_dir, "done", os.path.basename(job_path))
+                with open(f"{done}.tmp", "w") as f:
+                    json.dump(result, f)
+                os.replace(f"{done}.tmp", done)  # wait only sees complete results
+                try:
+                    os.remove(job_path)
+                except FileNotFoundError:
+                    pass
+                print(f"{os.path.basename(job_path)}: {result['status']} " + ", ".join(f"{stage} {seconds:.1f}s" for stage, seconds in result["timings"].items()))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Transcribe and diarize audio files with WhisperX.")
+    parser.add_argument("filepath", nargs="?", help="Audio file to transcribe, or a directory or glob pattern with --batch.")
+    parser.add_argument("--serve", action="store_true", help="Run as a long-lived service processing the queue.")
+    parser.add_argument("--batch", action="store_true", help="Transcribe all the files of a directory or glob pattern in parallel.")
+    parser.add_argument("--workers", type=int, help="Worker processes for --batch. Defaults to the cores divided by --threads.")
+    parser.add_argument("--threads", type=int, default=THREADS_PER_WORKER, help="Threads per worker process for --batch.")
+    parser.add_argument("--persona", help="Write the transcription to LinkedIn/<persona>/Transcriptions.")
+    parser.add_argument("--queue", default=QUEUE_DIR, help="Queue directory shared by the service and its clients.")
+    args = parser.parse_args()
+
+    hf_key = os.getenv("HF_KEY")
+
+    if args.serve:
+        TranscriptionService(hf_key, args.queue).serve()
+        sys.exit(0)
+    if args.filepath is None:
+        parser.error("filepath is required unless --serve is given")
+    if args.batch:
+        transcribe_batch(args.filepath, hf_key, args.persona, args.workers, args.threads)
+        sys.exit(0)
+
+    print("get_intermediate_transcription:")
+
+    if TranscriptionService.is_running(args.queue):
+        # Thin client: the running service already has the models loaded
+        result = TranscriptionService.wait(TranscriptionService.submit(args.filepath, args.persona, args.queue), args.queue)
+        if result["status"] != "ok":
+            sys.exit(result["error"])
+        with open(result["output"], "r") as f:
+            transcript = f.read()
+    else:
+        transcript, _, _ = TranscriptionIntermediateRequest(filepath=args.filepath, hf_key=hf_key).get_intermediate_transcription()
+        write_transcript(transcript, args.persona)
+
+    print(transcript)